@@ -7,8 +7,10 @@ This file will be protected by PyArmor to secure the public key.
 
 import json
 import base64
+import functools
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
+from utils.crypto_utils import verification_cache, verification_digest
 
 # Embedded public key (protected by PyArmor)
 PUBLIC_KEY_PEM = """-----BEGIN PUBLIC KEY-----
@@ -21,16 +23,38 @@ vMam3QpJjgeN8ZBlfjcQV6pjDJ1LZQ9cae5oLIUzH42hkzmck/PX9fTWhs/Opz5l
 cwIDAQAB
 -----END PUBLIC KEY-----"""
 
-
+@functools.lru_cache(maxsize=1)
 def load_public_key():
-    """Load the embedded public key"""
+    """Load the embedded public key (parsed once per process)"""
     return serialization.load_pem_public_key(PUBLIC_KEY_PEM.encode())
 
 
+def _verify(data: bytes, signature: bytes) -> bool:
+    """Verify an RSA-PSS signature, reusing recent outcomes"""
+    # Shares the LICENSE_VERIFY_CACHE_* cache with CryptoUtils; entries are
+    # namespaced because the two modules each embed their own public key.
+    digest = (__name__, verification_digest(data, signature))
+    verified = verification_cache.get(digest)
+    if verified is None:
+        try:
+            load_public_key().verify(
+                signature,
+                data,
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.MAX_LENGTH
+                ),
+                hashes.SHA256()
+            )
+            verified = True
+        except Exception:
+            verified = False
+        verification_cache.set(digest, verified)
+    return verified
+
+
 def decrypt_license_data(encrypted_data: str) -> dict:
     """Decrypt and verify license data with embedded public key"""
-    public_key = load_public_key()
-    
     try:
         # Decode the encrypted data
         combined_data = json.loads(base64.b64decode(encrypted_data))
@@ -38,15 +62,8 @@ def decrypt_license_data(encrypted_data: str) -> dict:
         signature = base64.b64decode(combined_data["signature"])
         
         # Verify signature with public key
-        public_key.verify(
-            signature,
-            data_bytes,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        if not _verify(data_bytes, signature):
+            raise ValueError("Invalid signature")
         
         # Return decrypted data
         return json.loads(data_bytes.decode('utf-8'))
@@ -57,20 +74,6 @@ def decrypt_license_data(encrypted_data: str) -> dict:
 
 def verify_license_signature(data: dict, signature_hex: str) -> bool:
     """Verify license signature with embedded public key"""
-    public_key = load_public_key()
     message = json.dumps(data, sort_keys=True).encode("utf-8")
     signature = bytes.fromhex(signature_hex)
-
-    try:
-        public_key.verify(
-            signature,
-            message,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return True
-    except Exception:
-        return False
\ No newline at end of file
+    return _verify(message, signature)
\ No newline at end of file
@@ -7,8 +7,12 @@ import json
 from typing import Dict, Optional
 
 class LicenseServerValidator:
-    def __init__(self, server_url: str = "http://localhost:8000"):
+    def __init__(self, server_url: str = "http://localhost:8000",
+                 connect_timeout: float = 3.0, read_timeout: float = 10.0):
         self.server_url = server_url
+        self.timeout = (connect_timeout, read_timeout)
+        # Keep-alive connections are reused across validations
+        self._session = requests.Session()
     
     def validate_license_with_server(self, license_key: str) -> Dict:
         """
@@ -22,7 +26,7 @@ class LicenseServerValidator:
             url = f"{self.server_url}/api/licenses/{license_key}"
             print(f"DEBUG: Making request to: {url}")
             
-            response = requests.get(url, timeout=10)
+            response = self._session.get(url, timeout=self.timeout)
             print(f"DEBUG: Server response status: {response.status_code}")
             print(f"DEBUG: Server response content: {response.text[:500]}...")
             
@@ -1,11 +1,28 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from middleware.license_middleware import LicenseMiddleware
-from services.license_service import LicenseService
-from routes.license_routes import router as license_router
-from routes.agent_routes import router as agent_router
+from middleware.metrics_middleware import MetricsMiddleware
+from routes.license_routes import router as license_router, license_service
+from routes.agent_routes import router as agent_router, agent_service
+from routes.metrics_routes import router as metrics_router
+from services import license_store
+from utils.logging_config import setup_logging
 
-app = FastAPI(title="Client Chat App", version="1.0.0")
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("LICENSE_WARMUP", "1") != "0":
+        await license_service.warm_up()
+    license_service.start_watching()
+    license_service.start_reverification()
+    yield
+    agent_service.shutdown()
+    await license_service.aclose()
+
+app = FastAPI(title="Client Chat App", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,11 +32,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-license_service = LicenseService()
+license_store.set_loader(license_service.reload_tenant_license)
 app.add_middleware(LicenseMiddleware, license_service=license_service)
+# Added last so it is outermost and also times requests rejected by LicenseMiddleware.
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(license_router)
 app.include_router(agent_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
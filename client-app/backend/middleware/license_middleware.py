@@ -1,90 +1,206 @@
-from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timezone
-import time
 import json
-from collections import defaultdict
+import logging
+import os
+import time
+from utils.rate_limiter import create_rate_limiter
+from utils.metrics import license_decisions, rate_limit_checks, rate_limit_check_duration
+from services.license_store import resolve_tenant
+
+logger = logging.getLogger(__name__)
+
+class LicenseMiddleware:
+    """Pure ASGI license gate for protected paths.
+
+    The ``/chat`` (and ``/chat/stream``) body is read once, parsed once and replayed to the app; the
+    parsed payload is shared with the route through ``request.state.chat_payload``.
+    ``/chat/batch`` is checked once per batch: agent access per item and one bulk
+    rate-limit reservation per agent, with per-item verdicts in ``request.state.chat_batch_verdicts``
+    and ``request.state.chat_batch_refund(agent, count)`` to return hits for items that were not run.
+    The license is looked up per tenant (``X-Tenant-ID`` or ``X-API-Key``) in the
+    license store only; a tenant not loaded yet is loaded in the background (503).
+    Responses pass straight through to ``send``, so streaming is not buffered.
+    """
 
-class LicenseMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, license_service):
-        super().__init__(app)
+    def __init__(self, app, license_service, rate_limiter=None):
+        self.app = app
         self.license_service = license_service
-        self.agent_timestamps = defaultdict(list)
-        self.protected_paths = ["/chat"]
-    
-    async def dispatch(self, request: Request, call_next):
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        self.protected_paths = ("/chat",)
+        self.chat_paths = ("/chat", "/chat/stream")
+        self.batch_paths = ("/chat/batch",)
+        self.max_batch_items = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "100"))
+
+    async def __call__(self, scope, receive, send):
         # Skip middleware for OPTIONS requests (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
-            
-        if not any(request.url.path.startswith(path) for path in self.protected_paths):
-            return await call_next(request)
-        
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        if not scope["path"].startswith(self.protected_paths):
+            await self.app(scope, receive, send)
+            return
+
         try:
-            current_license = self.license_service.get_current_license()
-            print(f"DEBUG: Middleware - current license: {current_license}")
-            if not current_license:
-                print("DEBUG: Middleware - No valid license found")
-                return JSONResponse(status_code=400, content={"detail": "No valid license"})
-            
-            if not current_license.get("server_verified", False):
-                return JSONResponse(status_code=403, content={"detail": "License not verified with server"})
-            
-            if self._is_license_expired(current_license):
-                return JSONResponse(status_code=401, content={"detail": "License expired"})
-            
-            if request.url.path == "/chat" and request.method == "POST":
-                body = await request.body()
-                request._body = body
-                
-                try:
-                    chat_data = json.loads(body.decode())
-                    agent = chat_data.get("agent")
-                    
-                    if agent and not self._check_agent_access(agent, current_license):
-                        return JSONResponse(status_code=403, content={"detail": f"Agent '{agent}' not available"})
-                    
-                    if agent and not self._check_rate_limit(agent, current_license):
-                        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
-                except:
-                    pass
-            
-            return await call_next(request)
-            
+            response, receive = await self._authorize(scope, receive)
         except Exception as e:
-            return JSONResponse(status_code=500, content={"detail": f"License validation error: {str(e)}"})
-    
-    def _is_license_expired(self, license_data):
+            response = JSONResponse(status_code=500, content={"detail": f"License validation error: {str(e)}"})
+
+        license_decisions.inc((str(response.status_code) if response is not None else "allowed",))
+        if response is not None:
+            scope["metrics_route"] = self._route_label(scope["path"])
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _authorize(self, scope, receive):
         try:
-            expires_str = license_data["expires_at"]
-            if expires_str.endswith('+00:00'):
-                expires_at = datetime.fromisoformat(expires_str)
-            elif 'T' in expires_str and not expires_str.endswith('Z'):
-                expires_at = datetime.fromisoformat(expires_str + '+00:00')
+            tenant = self._resolve_tenant(scope)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)}), receive
+
+        # Only the in-memory verdict is read here; validation (and the license
+        # server) is never awaited in the request path.
+        snapshot = self.license_service.get_license_snapshot(tenant)
+        if not snapshot and self.license_service.request_license_load(tenant):
+            return JSONResponse(status_code=503, content={"detail": "License is loading"},
+                                headers={"Retry-After": "1"}), receive
+        if not snapshot:
+            logger.debug("No valid license for tenant %s", tenant)
+            return JSONResponse(status_code=400, content={"detail": "No valid license"}), receive
+
+        if not snapshot.server_verified:
+            return JSONResponse(status_code=403, content={"detail": "License not verified with server"}), receive
+
+        if self._is_license_expired(snapshot):
+            return JSONResponse(status_code=401, content={"detail": "License expired"}), receive
+
+        if scope["path"] in self.chat_paths and scope["method"] == "POST":
+            body = await self._read_body(receive)
+            receive = self._replay_body(body, receive)
+
+            try:
+                chat_data = json.loads(body)
+            except ValueError:
+                return None, receive
+
+            if isinstance(chat_data, dict):
+                scope.setdefault("state", {})["chat_payload"] = chat_data
+                agent = chat_data.get("agent")
+
+                # Anything but a string agent is left to request validation (422).
+                if isinstance(agent, str) and agent:
+                    if not self._check_agent_access(agent, snapshot):
+                        return JSONResponse(status_code=403, content={"detail": f"Agent '{agent}' not available"}), receive
+
+                    if not self._check_rate_limit(agent, snapshot):
+                        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"}), receive
+
+        if scope["path"] in self.batch_paths and scope["method"] == "POST":
+            body = await self._read_body(receive)
+            receive = self._replay_body(body, receive)
+
+            try:
+                batch = json.loads(body)
+            except ValueError:
+                return None, receive
+
+            items = batch.get("items") if isinstance(batch, dict) else None
+            if isinstance(items, list):
+                if len(items) > self.max_batch_items:
+                    return JSONResponse(status_code=413, content={"detail": f"Batch exceeds {self.max_batch_items} items"}), receive
+                state = scope.setdefault("state", {})
+                state["chat_batch_payload"] = batch
+                state["chat_batch_verdicts"] = self._authorize_batch(items, snapshot)
+                state["chat_batch_refund"] = lambda agent, count: self._refund_rate_limit(agent, snapshot, count)
+
+        return None, receive
+
+    def _authorize_batch(self, items, snapshot):
+        """Return a verdict per item: ``None`` if allowed, else ``(status, detail)``."""
+        verdicts = [None] * len(items)
+        by_agent = {}
+        for i, item in enumerate(items):
+            agent = item.get("agent") if isinstance(item, dict) else None
+            if not isinstance(agent, str) or not isinstance(item.get("message"), str):
+                continue  # Left to request validation in the route.
+            if not self._check_agent_access(agent, snapshot):
+                verdicts[i] = (403, f"Agent '{agent}' not available")
             else:
-                expires_at = datetime.fromisoformat(expires_str.replace('Z', '+00:00'))
-            
-            return datetime.now(timezone.utc) > expires_at
-        except:
-            return False
-    
-    def _check_agent_access(self, agent, license_data):
-        return agent in license_data["agents"]
-    
-    def _check_rate_limit(self, agent, license_data):
-        limit = license_data["rate_limit"]
-        now = time.time()
-        
-        timestamps = [t for t in self.agent_timestamps[agent] if now - t < 60]
-        self.agent_timestamps[agent] = timestamps
-        
-        if len(timestamps) >= limit:
-            return False
-        
-        self.agent_timestamps[agent].append(now)
-        return True
-
-
-
-        # done some changes
\ No newline at end of file
+                by_agent.setdefault(agent, []).append(i)
+
+        for agent, indexes in by_agent.items():
+            granted = self._reserve_rate_limit(agent, snapshot, len(indexes))
+            for i in indexes[granted:]:
+                verdicts[i] = (429, "Rate limit exceeded")
+        return verdicts
+
+    def _route_label(self, path):
+        # Known paths label themselves; anything else under a protected prefix
+        # is grouped under that prefix to keep metric labels bounded.
+        if path in self.chat_paths or path in self.batch_paths:
+            return path
+        return next(prefix for prefix in self.protected_paths if path.startswith(prefix))
+
+    @staticmethod
+    def _resolve_tenant(scope):
+        tenant_id = api_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-tenant-id":
+                tenant_id = value.decode("latin-1")
+            elif name == b"x-api-key":
+                api_key = value.decode("latin-1")
+        return resolve_tenant(tenant_id, api_key)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_body(body, receive):
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
+
+    def _is_license_expired(self, snapshot):
+        return snapshot.is_expired()
+
+    def _check_agent_access(self, agent, snapshot):
+        return snapshot.allows_agent(agent)
+
+    def _check_rate_limit(self, agent, snapshot):
+        start = time.perf_counter()
+        allowed = self.rate_limiter.check((snapshot.tenant, snapshot.license_id, agent), snapshot.rate_limit)
+        rate_limit_check_duration.observe(time.perf_counter() - start)
+        rate_limit_checks.inc(("allowed" if allowed else "limited",))
+        return allowed
+
+    def _reserve_rate_limit(self, agent, snapshot, count):
+        start = time.perf_counter()
+        granted = self.rate_limiter.acquire((snapshot.tenant, snapshot.license_id, agent), snapshot.rate_limit, count)
+        rate_limit_check_duration.observe(time.perf_counter() - start)
+        if granted:
+            rate_limit_checks.inc(("allowed",), granted)
+        if granted < count:
+            rate_limit_checks.inc(("limited",), count - granted)
+        return granted
+
+    def _refund_rate_limit(self, agent, snapshot, count):
+        if count:
+            self.rate_limiter.release((snapshot.tenant, snapshot.license_id, agent), count)
@@ -0,0 +1,35 @@
+import time
+from utils.metrics import http_request_duration
+
+class MetricsMiddleware:
+    """Records request latency per matched route template (not raw path, to
+    keep label cardinality bounded)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Requests answered by an inner middleware never reach the router;
+            # such middleware may leave a bounded label in ``metrics_route``.
+            route_path = getattr(route, "path", None) or scope.get("metrics_route") or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                (scope["method"], route_path, str(status)),
+            )
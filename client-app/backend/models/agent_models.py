@@ -1,18 +1,124 @@
+import asyncio
+import os
+import re
+import time
+from models.agent_registry import AgentRegistry, AgentSpec
+from utils.metrics import agent_chat_duration, agent_response_cache_lookups
+from utils.response_cache import ResponseCache
+
+_DONE = object()
+
+BUILTIN_AGENTS = (
+    AgentSpec("agent1", "models.builtin_agents:agent1", cacheable=True),
+    AgentSpec("agent2", "models.builtin_agents:agent2", cacheable=True),
+    AgentSpec("a1", "models.builtin_agents:a1", cacheable=True),
+    AgentSpec("a2", "models.builtin_agents:a2", cacheable=True),
+)
+
+def default_registry() -> AgentRegistry:
+    registry = AgentRegistry(idle_unload=float(os.getenv("AGENT_IDLE_UNLOAD_SECONDS", "900")))
+    for spec in BUILTIN_AGENTS:
+        registry.register(spec)
+    registry.discover()
+    return registry
+
 class AgentManager:
-    def __init__(self):
-        self.agents = {
-            "agent1": "Hello I am agent 1",
-            "agent2": "Hello I am agent 2", 
-            "a1": "Hello I am a1",
-            "a2": "Hello I am a2"
-        }
-    
+    def __init__(self, registry: AgentRegistry = None):
+        # Agents are declared here and imported the first time they are used.
+        self.registry = registry or default_registry()
+        # Optional chunk producers per agent: streamer(message) returns a
+        # generator or async generator of text chunks.
+        self.streamers = {}
+        # Agents whose reply depends only on (agent, message) may opt into the
+        # response cache; the value is a per-agent TTL or None for the default.
+        self.cacheable = {spec.name: spec.cache_ttl for spec in self.registry.specs() if spec.cacheable}
+        self.response_cache = ResponseCache(
+            maxsize=int(os.getenv("AGENT_RESPONSE_CACHE_SIZE", "4096")),
+            ttl=float(os.getenv("AGENT_RESPONSE_CACHE_TTL", "300")),
+            max_bytes=int(os.getenv("AGENT_RESPONSE_CACHE_BYTES", str(16 * 1024 * 1024))),
+        )
+
+    def register_agent(self, name: str, target: str, cacheable: bool = False, cache_ttl: float = None):
+        self.registry.register(AgentSpec(name, target, cacheable, cache_ttl))
+        self.response_cache.invalidate(name)
+        if cacheable:
+            self.cacheable[name] = cache_ttl
+        else:
+            self.cacheable.pop(name, None)
+
+    def register_streamer(self, agent_name: str, streamer):
+        self.streamers[agent_name] = streamer
+
+    def declare_cacheable(self, agent_name: str, ttl: float = None):
+        self.cacheable[agent_name] = ttl
+
+    def cached_response(self, agent_name: str, message: str):
+        if agent_name not in self.cacheable:
+            return None
+        response = self.response_cache.get(ResponseCache.key(agent_name, message))
+        agent_response_cache_lookups.inc((agent_name, "miss" if response is None else "hit"))
+        return response
+
+    def cache_response(self, agent_name: str, message: str, response: str):
+        if agent_name in self.cacheable and agent_name in self.registry:
+            self.response_cache.set(ResponseCache.key(agent_name, message), response, self.cacheable[agent_name])
+
     def chat_with_agent(self, agent_name: str, message: str) -> str:
-        if agent_name not in self.agents:
+        response = self.cached_response(agent_name, message)
+        if response is None:
+            response = self.generate_response(agent_name, message)
+            self.cache_response(agent_name, message, response)
+        return response
+
+    def generate_response(self, agent_name: str, message: str) -> str:
+        if agent_name not in self.registry:
             return f"Agent '{agent_name}' not found"
-        
-        base_response = self.agents[agent_name]
-        return f"{base_response}. You said: '{message}'"
-    
+
+        start = time.perf_counter()
+        response = self.registry.get(agent_name).respond(message)
+        agent_chat_duration.observe(time.perf_counter() - start, (agent_name,))
+        return response
+
+    async def stream_chat_with_agent(self, agent_name: str, message: str):
+        if agent_name not in self.registry:
+            yield f"Agent '{agent_name}' not found"
+            return
+
+        start = time.perf_counter()
+        try:
+            streamer = self.streamers.get(agent_name)
+            if streamer is None:
+                agent = self.registry.peek(agent_name)
+                if agent is None:
+                    # First use imports agent code; keep that off the event loop.
+                    agent = await asyncio.to_thread(self.registry.get, agent_name)
+                if hasattr(agent, "stream"):
+                    streamer = agent.stream
+                else:
+                    # The reply is produced on a worker thread, then split into chunks.
+                    reply = await asyncio.to_thread(agent.respond, message)
+                    for chunk in self._stream_words(reply):
+                        yield chunk
+                    return
+            chunks = streamer(message)
+            if hasattr(chunks, "__aiter__"):
+                async for chunk in chunks:
+                    yield chunk
+            else:
+                # Sync generators may block between chunks; pull them on a worker thread.
+                iterator = iter(chunks)
+                while True:
+                    chunk = await asyncio.to_thread(next, iterator, _DONE)
+                    if chunk is _DONE:
+                        break
+                    yield chunk
+        finally:
+            agent_chat_duration.observe(time.perf_counter() - start, (agent_name,))
+
+    @staticmethod
+    def _stream_words(reply: str) -> list:
+        return re.findall(r"\S+\s*", reply)
+
     def get_available_agents(self, licensed_agents: list) -> list:
-        return [agent for agent in self.agents.keys() if agent in licensed_agents]
\ No newline at end of file
+        # Answered from registry metadata; no agent code is imported.
+        return [agent for agent in self.registry.names() if agent in licensed_agents]
@@ -0,0 +1,127 @@
+import importlib
+import logging
+import threading
+import time
+from importlib.metadata import entry_points
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "client_app.agents"
+
+
+class AgentSpec(NamedTuple):
+    """Metadata for an agent; ``target`` is a ``"module:factory"`` import path.
+
+    The factory is called with no arguments and returns an object with
+    ``respond(message) -> str`` and, optionally, ``stream(message)``.
+    """
+    name: str
+    target: str
+    cacheable: bool = False
+    cache_ttl: Optional[float] = None
+    description: str = ""
+
+
+class AgentRegistry:
+    """Agents declared by name and import path, imported on first use.
+
+    Listing agents only touches the specs. Loaded agents that have not been
+    used for ``idle_unload`` seconds are dropped and re-imported on demand
+    (``0`` keeps them loaded forever).
+    """
+
+    def __init__(self, idle_unload: float = 0):
+        self.idle_unload = idle_unload
+        self._specs = {}
+        self._loaded = {}
+        self._last_used = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def register(self, spec: AgentSpec):
+        with self._lock:
+            self._specs[spec.name] = spec
+            self._loaded.pop(spec.name, None)
+            self._load_locks.setdefault(spec.name, threading.Lock())
+
+    def discover(self, group: str = ENTRY_POINT_GROUP):
+        """Register agents advertised by installed packages under ``group``."""
+        for ep in entry_points(group=group):
+            self.register(AgentSpec(ep.name, ep.value))
+
+    def spec(self, name: str) -> Optional[AgentSpec]:
+        return self._specs.get(name)
+
+    def names(self) -> list:
+        return list(self._specs)
+
+    def specs(self) -> list:
+        return list(self._specs.values())
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def peek(self, name: str):
+        """Return the agent if it is already loaded, without importing it."""
+        agent = self._loaded.get(name)
+        if agent is not None:
+            self._last_used[name] = time.monotonic()
+        return agent
+
+    def get(self, name: str):
+        agent = self.peek(name)
+        if agent is None:
+            agent = self._load(name)
+        self._maybe_sweep()
+        return agent
+
+    def loaded(self) -> list:
+        return list(self._loaded)
+
+    def unload(self, name: str):
+        with self._lock:
+            self._loaded.pop(name, None)
+            self._last_used.pop(name, None)
+
+    def unload_idle(self, now: float = None) -> list:
+        if not self.idle_unload:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [name for name in self._loaded if now - self._last_used.get(name, now) > self.idle_unload]
+            for name in idle:
+                del self._loaded[name]
+                self._last_used.pop(name, None)
+        for name in idle:
+            logger.info("Unloaded idle agent %s", name)
+        return idle
+
+    def _load(self, name: str):
+        spec = self._specs.get(name)
+        if spec is None:
+            raise KeyError(name)
+        with self._load_locks[name]:
+            agent = self._loaded.get(name)
+            if agent is not None:
+                return agent
+            start = time.perf_counter()
+            module_name, _, attr = spec.target.partition(":")
+            factory = importlib.import_module(module_name)
+            for part in attr.split(".") if attr else ():
+                factory = getattr(factory, part)
+            agent = factory()
+            with self._lock:
+                self._loaded[name] = agent
+                self._last_used[name] = time.monotonic()
+            logger.info("Loaded agent %s from %s in %.1f ms", name, spec.target, (time.perf_counter() - start) * 1000)
+            return agent
+
+    def _maybe_sweep(self):
+        if not self.idle_unload:
+            return
+        now = time.monotonic()
+        if now - self._last_sweep >= self.idle_unload / 4:
+            self._last_sweep = now
+            self.unload_idle(now)
@@ -0,0 +1,21 @@
+class GreetingAgent:
+    """Deterministic demo agent that greets and echoes the message."""
+
+    def __init__(self, greeting: str):
+        self.greeting = greeting
+
+    def respond(self, message: str) -> str:
+        return f"{self.greeting}. You said: '{message}'"
+
+
+def agent1():
+    return GreetingAgent("Hello I am agent 1")
+
+def agent2():
+    return GreetingAgent("Hello I am agent 2")
+
+def a1():
+    return GreetingAgent("Hello I am a1")
+
+def a2():
+    return GreetingAgent("Hello I am a2")
@@ -1,30 +1,192 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from services.agent_service import AgentService
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, ValidationError
+from services.agent_service import AgentOverloadedError, AgentService
+from routes.conditional import VersionedResponseCache
+from routes.license_routes import license_service
+from routes.tenant import get_tenant
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["agents"])
 agent_service = AgentService()
+available_agents_responses = VersionedResponseCache(maxsize=int(os.getenv("LICENSE_MAX_TENANTS", "1024")))
 
 class ChatMessage(BaseModel):
     agent: str
     message: str
 
-@router.post("/chat")
-async def chat_with_agent(chat: ChatMessage):
-    response = agent_service.chat_with_agent(chat.agent, chat.message)
+def _body_error(error: Exception = None, body=None) -> RequestValidationError:
+    # Same error shape FastAPI produces for a declared body parameter.
+    if isinstance(error, json.JSONDecodeError):
+        return RequestValidationError([{"type": "json_invalid", "loc": ("body", error.pos), "msg": "JSON decode error",
+                                        "input": {}, "ctx": {"error": error.msg}}], body=error.doc)
+    if isinstance(error, ValidationError):
+        return RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in error.errors(include_url=False)],
+                                      body=body)
+    return RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+
+async def _read_json_body(request: Request):
+    # An empty body and a JSON null are both a missing body, as in FastAPI.
+    if not await request.body():
+        raise _body_error()
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError as e:
+        raise _body_error(e)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    if payload is None:
+        raise _body_error()
+    return payload
+
+async def read_chat_message(request: Request) -> ChatMessage:
+    # LicenseMiddleware has already parsed the body for /chat; reuse it.
+    payload = getattr(request.state, "chat_payload", None)
+    if payload is None:
+        payload = await _read_json_body(request)
+    try:
+        # from_attributes matches how FastAPI validates body models.
+        return ChatMessage.model_validate(payload, from_attributes=True)
+    except ValidationError as e:
+        raise _body_error(e, payload)
+
+CHAT_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ChatMessage.model_json_schema()}},
+    }
+}
+
+@router.post("/chat", openapi_extra=CHAT_REQUEST_BODY)
+async def chat_with_agent(chat: ChatMessage = Depends(read_chat_message)):
+    try:
+        response = await agent_service.chat_with_agent_async(chat.agent, chat.message)
+    except AgentOverloadedError as e:
+        raise _overloaded(e)
     return {"agent": chat.agent, "response": response}
 
+def _overloaded(error: AgentOverloadedError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+class ChatBatch(BaseModel):
+    items: list[ChatMessage]
+
+class _BatchEnvelope(BaseModel):
+    # Items are validated one by one in _run_batch_item, so a bad item fails alone.
+    items: list
+
+@router.post("/chat/batch", openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": ChatBatch.model_json_schema()}}}
+})
+async def chat_batch(request: Request):
+    # LicenseMiddleware validated the license once for the whole batch and left a verdict per item.
+    batch = getattr(request.state, "chat_batch_payload", None)
+    if batch is None:
+        batch = await _read_json_body(request)
+    try:
+        items = _BatchEnvelope.model_validate(batch, from_attributes=True).items
+    except ValidationError as e:
+        raise _body_error(e, batch)
+    verdicts = getattr(request.state, "chat_batch_verdicts", None) or [None] * len(items)
+
+    # Each agent's items run at most per_agent_limit at a time, so a batch
+    # never fills the agent's wait queue on its own.
+    limits = {}
+    for item in items:
+        agent = item.get("agent") if isinstance(item, dict) else None
+        if isinstance(agent, str) and agent not in limits:
+            limits[agent] = asyncio.Semaphore(agent_service.executor.per_agent_limit)
+
+    results = await asyncio.gather(*(_run_batch_item(item, verdict, limits) for item, verdict in zip(items, verdicts)))
+
+    # Items shed with 503 never ran; give their rate-limit hits back.
+    refund = getattr(request.state, "chat_batch_refund", None)
+    if refund is not None:
+        shed = Counter(result["agent"] for result in results if result["status"] == 503)
+        for agent, count in shed.items():
+            refund(agent, count)
+    return {"results": results}
+
+async def _run_batch_item(item, verdict, limits):
+    try:
+        chat = ChatMessage.model_validate(item)
+    except ValidationError as e:
+        # Same shape as every other result; "agent" is whatever the item sent (or None).
+        agent = item.get("agent") if isinstance(item, dict) else None
+        return {"agent": agent, "status": 422, "error": e.errors(include_url=False, include_context=False)}
+    if verdict is not None:
+        status, detail = verdict
+        return {"agent": chat.agent, "status": status, "error": detail}
+    try:
+        async with limits[chat.agent]:
+            response = await agent_service.chat_with_agent_async(chat.agent, chat.message)
+    except AgentOverloadedError as e:
+        return {"agent": chat.agent, "status": 503, "error": str(e), "retry_after": e.retry_after}
+    except Exception as e:
+        logger.warning("Batch item for agent %s failed: %s", chat.agent, e)
+        return {"agent": chat.agent, "status": 500, "error": str(e)}
+    return {"agent": chat.agent, "status": 200, "response": response}
+
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.post("/chat/stream", openapi_extra=CHAT_REQUEST_BODY)
+async def stream_chat_with_agent(request: Request, chat: ChatMessage = Depends(read_chat_message)):
+    # License and rate limits were checked by LicenseMiddleware before the stream starts.
+    try:
+        chunks, slot = await agent_service.open_stream(chat.agent, chat.message)
+    except AgentOverloadedError as e:
+        raise _overloaded(e)
+    # The slot is also released by the stream itself; this covers streams that never start.
+    release = BackgroundTask(slot.release)
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson_events(chat.agent, chunks), media_type="application/x-ndjson",
+                                 headers=STREAM_HEADERS, background=release)
+    return StreamingResponse(_sse_events(chat.agent, chunks), media_type="text/event-stream",
+                             headers=STREAM_HEADERS, background=release)
+
+async def _sse_events(agent: str, chunks):
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'agent': agent, 'delta': chunk})}\n\n"
+    except Exception as e:
+        logger.warning("Chat stream for agent %s failed: %s", agent, e)
+        yield f"event: error\ndata: {json.dumps({'agent': agent, 'detail': str(e)})}\n\n"
+        return
+    yield f"event: done\ndata: {json.dumps({'agent': agent})}\n\n"
+
+async def _ndjson_events(agent: str, chunks):
+    try:
+        async for chunk in chunks:
+            yield json.dumps({"agent": agent, "delta": chunk}) + "\n"
+    except Exception as e:
+        logger.warning("Chat stream for agent %s failed: %s", agent, e)
+        yield json.dumps({"agent": agent, "error": str(e)}) + "\n"
+        return
+    yield json.dumps({"agent": agent, "done": True}) + "\n"
+
 @router.get("/available-agents")
-async def get_available_agents():
+async def get_available_agents(request: Request, tenant: str = Depends(get_tenant)):
     try:
-        from services.license_service import LicenseService
-        license_service = LicenseService()
-        current_license = license_service.get_current_license()
-        if not current_license:
+        snapshot = await license_service.resolve_license_snapshot(tenant)
+        if not snapshot:
             return {"agents": []}
-        
-        agents = agent_service.get_available_agents(current_license["agents"])
-        return {"agents": agents}
+
+        # Rebuilt only when the tenant's license version changes.
+        return available_agents_responses.respond(
+            request, tenant, snapshot.version,
+            lambda: {"agents": agent_service.get_available_agents(snapshot.agents)})
     except Exception as e:
-        print(f"DEBUG: Error getting available agents: {e}")
-        return {"agents": []}
\ No newline at end of file
+        logger.warning("Error getting available agents: %s", e)
+        return {"agents": []}
+
+@router.get("/agent-cache-stats")
+async def get_agent_cache_stats():
+    return {"responses": agent_service.cache_stats()}
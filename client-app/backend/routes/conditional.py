@@ -0,0 +1,45 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class VersionedResponseCache:
+    """JSON bodies rendered once per (key, license version), served with ETags.
+
+    ``build`` only runs when the license version for ``key`` changes, and a
+    matching ``If-None-Match`` gets a 304 without touching the body at all.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def respond(self, request: Request, key, version: int, build) -> Response:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            body = json.dumps(build(), separators=(",", ":")).encode()
+            entry = (version, body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        _, body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
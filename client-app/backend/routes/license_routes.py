@@ -1,57 +1,123 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
+import hashlib
+import logging
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 from services.license_service import LicenseService
+from routes.conditional import VersionedResponseCache
+from routes.tenant import get_tenant
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/license", tags=["license"])
 license_service = LicenseService()
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_LICENSE_BYTES = int(os.getenv("LICENSE_MAX_UPLOAD_BYTES", str(1024 * 1024)))
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+status_responses = VersionedResponseCache(maxsize=int(os.getenv("LICENSE_MAX_TENANTS", "1024")))
+
 class LicenseInput(BaseModel):
     license_data: dict
 
 @router.post("/validate")
-async def validate_license(license_input: LicenseInput):
+async def validate_license(license_input: LicenseInput, tenant: str = Depends(get_tenant)):
     try:
-        result = license_service.validate_license_data(license_input.license_data)
+        result = license_service.validate_license_data(license_input.license_data, tenant)
         return {"status": "success", "license": result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/upload")
-async def upload_license_file(file: UploadFile = File(...)):
+async def _capped_stream(request: Request, limit: int):
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail="License file too large")
+        yield chunk
+
+async def _read_upload_form(request: Request) -> UploadFile:
+    # Parsed here rather than through File(...), so oversized bodies are
+    # refused before they are spooled instead of after.
+    limit = MAX_LICENSE_BYTES + MULTIPART_OVERHEAD_BYTES
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail="License file too large")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
     try:
-        print(f"DEBUG: Received file upload: {file.filename}")
-        content = await file.read()
-        print(f"DEBUG: File size: {len(content)} bytes")
-        
-        with open("license.lic", "wb") as f:
-            f.write(content)
+        form = await MultiPartParser(request.headers, _capped_stream(request, limit), max_files=1).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    file = form.get("file")
+    if not isinstance(file, UploadFile):
+        await form.close()
+        raise RequestValidationError([{"type": "missing", "loc": ("body", "file"), "msg": "Field required", "input": None}])
+    return file
+
+async def _read_upload(file: UploadFile):
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_LICENSE_BYTES:
+            raise HTTPException(status_code=413, detail="License file too large")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+@router.post("/upload", openapi_extra={
+    "requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+    }}}}
+})
+async def upload_license_file(request: Request, tenant: str = Depends(get_tenant)):
+    file = await _read_upload_form(request)
+    try:
+        logger.debug("Received file upload: %s", file.filename)
+        content, digest = await _read_upload(file)
+        logger.debug("File size: %d bytes", len(content))
         
-        print("DEBUG: Starting license validation...")
-        result = license_service.validate_license_file("license.lic")
-        print(f"DEBUG: Validation successful: {result}")
+        logger.debug("Starting license validation...")
+        result = await license_service.install_license_bytes_async(content, tenant, digest)
+        logger.info("License upload validated for tenant %s", tenant)
         return {"status": "success", "license": result}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"DEBUG: License upload failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("License upload failed: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
 
 @router.post("/validate-file")
-async def validate_existing_license_file():
+async def validate_existing_license_file(tenant: str = Depends(get_tenant)):
     try:
-        print("DEBUG: Validating existing license file...")
-        result = license_service.validate_existing_license()
-        print(f"DEBUG: Existing license validation successful: {result}")
+        logger.debug("Validating existing license file...")
+        result = await license_service.validate_existing_license_async(tenant)
+        logger.info("Existing license validated for tenant %s", tenant)
         return {"status": "success", "license": result}
     except Exception as e:
-        print(f"DEBUG: Existing license validation failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Existing license validation failed: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/status")
-async def get_license_status():
-    current_license = license_service.get_current_license()
-    if not current_license:
+async def get_license_status(request: Request, tenant: str = Depends(get_tenant)):
+    snapshot = await license_service.resolve_license_snapshot(tenant)
+    if snapshot is None:
         raise HTTPException(status_code=400, detail="No valid license")
-    return current_license
\ No newline at end of file
+    return status_responses.respond(request, tenant, snapshot.version,
+                                    lambda: license_service.get_current_license(tenant))
+
+@router.get("/cache-stats")
+async def get_license_cache_stats():
+    return {"server_verification": license_service.get_server_cache_stats()}
\ No newline at end of file
@@ -0,0 +1,8 @@
+from fastapi import HTTPException, Request
+from services.license_store import resolve_tenant, TENANT_HEADER, API_KEY_HEADER
+
+def get_tenant(request: Request) -> str:
+    try:
+        return resolve_tenant(request.headers.get(TENANT_HEADER), request.headers.get(API_KEY_HEADER))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
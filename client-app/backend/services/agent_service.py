@@ -1,11 +1,154 @@
+import asyncio
+import functools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from models.agent_models import AgentManager
+from utils.metrics import agent_in_flight, agent_queue_depth, agent_queue_wait, agent_rejected
+
+class AgentOverloadedError(Exception):
+    def __init__(self, agent_name: str, retry_after: int):
+        super().__init__(f"Agent '{agent_name}' is overloaded, retry in {retry_after}s")
+        self.agent_name = agent_name
+        self.retry_after = retry_after
+
+class _Slot:
+    def __init__(self, executor, agent_name):
+        self._executor = executor
+        self._agent_name = agent_name
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._executor._release(self._agent_name)
+
+class AgentExecutor:
+    """Runs agent calls off the event loop with per-agent concurrency limits.
+
+    Each agent gets ``per_agent_limit`` slots and a wait queue of at most
+    ``max_queue`` callers; once the queue is full new calls fail fast with
+    ``AgentOverloadedError`` instead of piling up.
+    """
+
+    def __init__(self, mode: str = None, max_workers: int = None,
+                 per_agent_limit: int = None, max_queue: int = None):
+        self.mode = (mode or os.getenv("AGENT_EXECUTOR_MODE", "thread")).lower()
+        self.max_workers = max_workers or int(os.getenv("AGENT_MAX_WORKERS", "32"))
+        self.per_agent_limit = per_agent_limit or int(os.getenv("AGENT_CONCURRENCY_PER_AGENT", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("AGENT_MAX_QUEUE", "64"))
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        elif self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent")
+        else:
+            raise ValueError(f"Unknown agent executor mode: {self.mode}")
+        self._semaphores = {}
+        self._waiting = {}
+        self._avg_runtime = {}
+
+    async def run(self, agent_name: str, fn, *args):
+        slot = await self.acquire(agent_name)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args))
+        finally:
+            self._record_runtime(agent_name, time.perf_counter() - start)
+            slot.release()
+
+    async def acquire(self, agent_name: str) -> _Slot:
+        semaphore = self._semaphores.get(agent_name)
+        if semaphore is None:
+            semaphore = self._semaphores[agent_name] = asyncio.Semaphore(self.per_agent_limit)
+
+        waiting = self._waiting.get(agent_name, 0)
+        if semaphore.locked() and waiting >= self.max_queue:
+            agent_rejected.inc((agent_name,))
+            raise AgentOverloadedError(agent_name, self._retry_after(agent_name, waiting))
+
+        self._waiting[agent_name] = waiting + 1
+        agent_queue_depth.inc((agent_name,))
+        start = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[agent_name] -= 1
+            agent_queue_depth.dec((agent_name,))
+        agent_queue_wait.observe(time.perf_counter() - start, (agent_name,))
+        agent_in_flight.inc((agent_name,))
+        return _Slot(self, agent_name)
+
+    def queue_depth(self, agent_name: str) -> int:
+        return self._waiting.get(agent_name, 0)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, agent_name: str):
+        agent_in_flight.dec((agent_name,))
+        self._semaphores[agent_name].release()
+
+    def _record_runtime(self, agent_name: str, elapsed: float):
+        previous = self._avg_runtime.get(agent_name)
+        self._avg_runtime[agent_name] = elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+
+    def _retry_after(self, agent_name: str, waiting: int) -> int:
+        # Rough time for the queue ahead of the caller to drain.
+        runtime = self._avg_runtime.get(agent_name, 1.0)
+        return max(1, math.ceil(runtime * (waiting + 1) / self.per_agent_limit))
+
+# Process-pool workers build their own AgentManager on first use.
+_process_agent_manager = None
+
+def _chat_in_process(agent_name: str, message: str):
+    global _process_agent_manager
+    if _process_agent_manager is None:
+        _process_agent_manager = AgentManager()
+    return _process_agent_manager.generate_response(agent_name, message)
 
 class AgentService:
-    def __init__(self):
+    def __init__(self, executor: AgentExecutor = None):
         self.agent_manager = AgentManager()
-    
+        self.executor = executor or AgentExecutor()
+
     def chat_with_agent(self, agent_name: str, message: str):
         return self.agent_manager.chat_with_agent(agent_name, message)
-    
+
+    async def chat_with_agent_async(self, agent_name: str, message: str):
+        # Cache hits are answered on the event loop without taking an executor slot.
+        response = self.agent_manager.cached_response(agent_name, message)
+        if response is not None:
+            return response
+        if self.executor.mode == "process":
+            response = await self.executor.run(agent_name, _chat_in_process, agent_name, message)
+        else:
+            response = await self.executor.run(agent_name, self.agent_manager.generate_response, agent_name, message)
+        self.agent_manager.cache_response(agent_name, message, response)
+        return response
+
+    async def open_stream(self, agent_name: str, message: str):
+        """Reserve a slot for ``agent_name`` (raising ``AgentOverloadedError``
+        before any bytes are sent) and return the chunk stream and its slot."""
+        slot = await self.executor.acquire(agent_name)
+        return self._stream_with_slot(slot, agent_name, message), slot
+
+    async def _stream_with_slot(self, slot, agent_name: str, message: str):
+        try:
+            async for chunk in self.agent_manager.stream_chat_with_agent(agent_name, message):
+                yield chunk
+        finally:
+            slot.release()
+
+    def stream_chat_with_agent(self, agent_name: str, message: str):
+        return self.agent_manager.stream_chat_with_agent(agent_name, message)
+
+    def cache_stats(self) -> dict:
+        return self.agent_manager.response_cache.stats()
+
     def get_available_agents(self, licensed_agents: list):
-        return self.agent_manager.get_available_agents(licensed_agents)
\ No newline at end of file
+        return self.agent_manager.get_available_agents(licensed_agents)
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -1,34 +1,260 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+from utils.crypto_utils import CryptoUtils
 from validators.license_validator import LicenseValidator
 from pathlib import Path
 from services import license_store
+from services.license_store import DEFAULT_TENANT
+from utils.file_utils import atomic_write_bytes
+from utils.metrics import license_reverifications
+
+logger = logging.getLogger(__name__)
+
+LICENSES_DIR = Path(os.getenv("LICENSES_DIR", "licenses"))
+
+def license_path(tenant: str = DEFAULT_TENANT) -> Path:
+    if tenant == DEFAULT_TENANT:
+        return Path("license.lic")
+    return LICENSES_DIR / f"{tenant}.lic"
+
+def _scan_license_files() -> frozenset:
+    """Tenants that currently have a license file on disk."""
+    tenants = {DEFAULT_TENANT} if license_path(DEFAULT_TENANT).is_file() else set()
+    try:
+        with os.scandir(LICENSES_DIR) as entries:
+            for entry in entries:
+                tenant = entry.name.removesuffix(".lic")
+                if entry.name.endswith(".lic") and tenant != DEFAULT_TENANT and entry.is_file():
+                    tenants.add(tenant)
+    except FileNotFoundError:
+        pass
+    return frozenset(tenants)
+
+def _file_digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 class LicenseService:
     def __init__(self):
         self.license_validator = LicenseValidator()
+        # tenant -> ((mtime_ns, size, inode), sha256) of its license file as last seen by the watcher.
+        self._watched_files = {}
+        # Tenants with a license file, refreshed off the request path by warm-up
+        # and the watcher; None until the first scan.
+        self._license_files = None
+        self._watch_task = None
+        self._reverify_task = None
     
-    def validate_license_data(self, license_data: dict):
+    def validate_license_data(self, license_data: dict, tenant: str = DEFAULT_TENANT):
         result = self.license_validator.validate_license_data(license_data)
-        license_store.set_license(result)
+        license_store.set_license(result, tenant)
         return result
     
-    def validate_license_file(self, file_path: str = None):
-        if file_path:
-            license_path = Path(file_path)
-            with open(license_path, "rb") as f:
-                content = f.read()
-            with open("license.lic", "wb") as f:
-                f.write(content)
-            result = self.license_validator.validate_license_file("license.lic")
-        else:
-            result = self.license_validator.validate_license_file()
+    def validate_license_file(self, file_path: str = None, tenant: str = DEFAULT_TENANT):
+        target = license_path(tenant)
+        if file_path and Path(file_path).resolve() != target.resolve():
+            return self.install_license_bytes(Path(file_path).read_bytes(), tenant)
+        result = self.license_validator.validate_license_file(str(target))
         
-        license_store.set_license(result)
+        license_store.set_license(result, tenant)
         return result
     
-    def validate_existing_license(self):
-        result = self.license_validator.validate_license_file()
-        license_store.set_license(result)
+    async def validate_license_file_async(self, file_path: str = None, tenant: str = DEFAULT_TENANT):
+        target = license_path(tenant)
+        if file_path and Path(file_path).resolve() != target.resolve():
+            content = await asyncio.to_thread(Path(file_path).read_bytes)
+            return await self.install_license_bytes_async(content, tenant)
+        result = await self.license_validator.validate_license_file_async(str(target))
+
+        license_store.set_license(result, tenant)
+        return result
+
+    def install_license_bytes(self, content: bytes, tenant: str = DEFAULT_TENANT, digest: str = None):
+        # Validate from memory; only an accepted license replaces the tenant's file.
+        result = self.license_validator.validate_license_bytes(content, digest)
+        atomic_write_bytes(license_path(tenant), content)
+        self._add_license_file(tenant)
+        license_store.set_license(result, tenant)
+        return result
+
+    async def install_license_bytes_async(self, content: bytes, tenant: str = DEFAULT_TENANT, digest: str = None):
+        result = await self.license_validator.validate_license_bytes_async(content, digest)
+        await asyncio.to_thread(atomic_write_bytes, license_path(tenant), content)
+        self._add_license_file(tenant)
+        license_store.set_license(result, tenant)
         return result
+
+    def validate_existing_license(self, tenant: str = DEFAULT_TENANT):
+        return self.validate_license_file(tenant=tenant)
+
+    async def validate_existing_license_async(self, tenant: str = DEFAULT_TENANT):
+        return await self.validate_license_file_async(tenant=tenant)
+
+    async def reload_tenant_license(self, tenant: str):
+        # Loader for tenants evicted from the store (or never loaded in this process).
+        if not await asyncio.to_thread(license_path(tenant).exists):
+            return None
+        return await self.validate_license_file_async(tenant=tenant)
+
+    async def warm_up(self, timeout: float = None):
+        """Pay first-request costs at startup: load the public key (and
+        ``cryptography``) and validate the default tenant's license.lic."""
+        timeout = timeout if timeout is not None else float(os.getenv("LICENSE_WARMUP_TIMEOUT", "15"))
+        try:
+            await self.refresh_license_files()
+            await asyncio.to_thread(CryptoUtils.load_public_key)
+            result = await asyncio.wait_for(self.reload_tenant_license(DEFAULT_TENANT), timeout)
+        except Exception as e:
+            logger.warning("License warm-up failed: %r", e)
+            return None
+        if result is not None:
+            logger.info("License warm-up complete (server_verified=%s)", result.get("server_verified"))
+        return result
+
+    def start_watching(self, interval: float = None):
+        """Poll license files of the default and loaded tenants and re-validate
+        a tenant when its file's content changes."""
+        interval = interval if interval is not None else float(os.getenv("LICENSE_WATCH_INTERVAL", "2"))
+        if interval <= 0 or self._watch_task is not None:
+            return
+        self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        task, self._watch_task = self._watch_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def refresh_license_files(self):
+        """Re-list the tenants that have a license file."""
+        self._license_files = await asyncio.to_thread(_scan_license_files)
+
+    def _add_license_file(self, tenant: str):
+        if self._license_files is not None:
+            self._license_files = self._license_files | {tenant}
+
+    async def _watch(self, interval: float):
+        while True:
+            try:
+                await self.refresh_license_files()
+            except Exception as e:
+                logger.warning("Listing license files failed: %s", e)
+            await asyncio.sleep(interval)
+            for tenant in {DEFAULT_TENANT, *license_store.store.tenants()}:
+                try:
+                    await self._check_license_file(tenant)
+                except Exception as e:
+                    logger.warning("Re-validation of changed license for tenant %s failed: %s", tenant, e)
+
+    async def _check_license_file(self, tenant: str):
+        path = license_path(tenant)
+        try:
+            st = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            self._watched_files.pop(tenant, None)
+            return
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        seen = self._watched_files.get(tenant)
+        if seen is not None and seen[0] == signature:
+            return
+
+        digest = await asyncio.to_thread(_file_digest, path)
+        self._watched_files[tenant] = (signature, digest)
+        if seen is not None and seen[1] == digest:
+            return  # Touched or rewritten with the same content.
+        # Unchanged content is answered from the validator's digest memo; a new
+        # license only replaces the active one once it has validated.
+        await self.validate_license_file_async(tenant=tenant)
+        if seen is not None:
+            logger.info("License file for tenant %s changed; re-validated", tenant)
+
+    def request_license_load(self, tenant: str) -> bool:
+        """Begin loading a tenant's license in the background; ``False`` when
+        the tenant has no license file or a recent load for it failed.
+
+        Whether a file exists is answered from the last scan by warm-up or
+        the watcher, never by touching the disk on the request path. Before
+        the first scan the background loader decides."""
+        if self._license_files is not None and tenant not in self._license_files:
+            return False
+        return license_store.load_in_background(tenant)
+
+    def start_reverification(self, interval: float = None, jitter: float = None, concurrency: int = None):
+        """Periodically re-check every loaded tenant's license with the server,
+        so revocations and plan changes reach the store without a request
+        ever waiting on the network."""
+        interval = interval if interval is not None else float(os.getenv("LICENSE_REVERIFY_INTERVAL", "300"))
+        jitter = jitter if jitter is not None else float(os.getenv("LICENSE_REVERIFY_JITTER", "0.1"))
+        concurrency = concurrency or int(os.getenv("LICENSE_REVERIFY_CONCURRENCY", "4"))
+        if interval <= 0 or self._reverify_task is not None:
+            return
+        self._reverify_task = asyncio.create_task(self._reverify_loop(interval, jitter, concurrency))
+
+    async def stop_reverification(self):
+        task, self._reverify_task = self._reverify_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _reverify_loop(self, interval: float, jitter: float, concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(tenant):
+            async with semaphore:
+                await self.reverify_tenant_license(tenant)
+
+        while True:
+            # Jitter keeps replicas started together from hitting the server in lockstep.
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+            await asyncio.gather(*(bounded(tenant) for tenant in license_store.store.tenants()))
+
+    async def reverify_tenant_license(self, tenant: str):
+        try:
+            path = license_path(tenant)
+            if not await asyncio.to_thread(path.exists):
+                license_reverifications.inc(("skipped",))
+                return None
+            result = await self.license_validator.reverify_license_file_async(str(path))
+        except Exception as e:
+            logger.warning("Re-verification of license for tenant %s failed: %s", tenant, e)
+            license_reverifications.inc(("failed",))
+            return None
+        if result is None:
+            logger.info("License server gave no verdict for tenant %s; keeping the current one", tenant)
+            license_reverifications.inc(("skipped",))
+            return None
+        if result == license_store.get_license(tenant):
+            license_reverifications.inc(("unchanged",))
+            return result
+        # One store assignment swaps license and snapshot together.
+        license_store.set_license(result, tenant)
+        logger.info("License for tenant %s changed on the server (server_verified=%s)",
+                    tenant, result.get("server_verified"))
+        license_reverifications.inc(("updated",))
+        return result
+
+    def get_server_cache_stats(self):
+        return self.license_validator.server_validator.cache_stats()
+
+    async def aclose(self):
+        await self.stop_watching()
+        await self.stop_reverification()
+        await self.license_validator.server_validator.aclose()
     
-    def get_current_license(self):
-        return license_store.get_license()
\ No newline at end of file
+    def get_current_license(self, tenant: str = DEFAULT_TENANT):
+        return license_store.get_license(tenant)
+
+    def get_license_snapshot(self, tenant: str = DEFAULT_TENANT):
+        return license_store.get_snapshot(tenant)
+
+    async def resolve_license_snapshot(self, tenant: str = DEFAULT_TENANT):
+        return await license_store.resolve_snapshot(tenant)
@@ -0,0 +1,110 @@
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class AgentIndex:
+    """Registry of agent names to bit positions, shared by all tenants so each
+    license's entitlements fit in a single int."""
+
+    def __init__(self):
+        self._bits = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def bit(self, name: str) -> int:
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(name)
+                if bit is None:
+                    bit = 1 << len(self._names)
+                    self._names.append(name)
+                    self._bits[name] = bit
+        return bit
+
+    def lookup(self, name: str) -> int:
+        return self._bits.get(name, 0)
+
+    def mask(self, names) -> int:
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+    def names(self, mask: int) -> list:
+        return [name for i, name in enumerate(self._names) if mask >> i & 1]
+
+
+agent_index = AgentIndex()
+
+
+class LicenseSnapshot:
+    """Immutable, pre-parsed view of a validated license for the request path."""
+
+    __slots__ = ("version", "tenant", "license_id", "plan", "agent_mask", "rate_limit",
+                 "expires_at", "expires_epoch", "server_verified")
+
+    def __init__(self, version, tenant, license_id, plan, agent_mask, rate_limit,
+                 expires_at, expires_epoch, server_verified):
+        set_ = object.__setattr__
+        set_(self, "version", version)
+        set_(self, "tenant", tenant)
+        set_(self, "license_id", license_id)
+        set_(self, "plan", plan)
+        set_(self, "agent_mask", agent_mask)
+        set_(self, "rate_limit", rate_limit)
+        set_(self, "expires_at", expires_at)
+        set_(self, "expires_epoch", expires_epoch)
+        set_(self, "server_verified", server_verified)
+
+    @classmethod
+    def compile(cls, license_data: dict, version: int = 0, tenant: str = None) -> "LicenseSnapshot":
+        expires_at = license_data.get("expires_at")
+        return cls(
+            version=version,
+            tenant=tenant,
+            license_id=license_data.get("license_key") or license_data.get("plan"),
+            plan=license_data.get("plan"),
+            agent_mask=agent_index.mask(license_data.get("agents") or ()),
+            rate_limit=int(license_data.get("rate_limit", license_data.get("rate_limit_per_min", 0))),
+            expires_at=expires_at,
+            expires_epoch=parse_expiry(expires_at),
+            server_verified=bool(license_data.get("server_verified", False)),
+        )
+
+    def is_expired(self, now: float = None) -> bool:
+        return (time.time() if now is None else now) > self.expires_epoch
+
+    @property
+    def agents(self) -> frozenset:
+        return frozenset(agent_index.names(self.agent_mask))
+
+    def allows_agent(self, agent: str) -> bool:
+        return bool(self.agent_mask & agent_index.lookup(agent))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LicenseSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("LicenseSnapshot is immutable")
+
+    def __repr__(self):
+        return (f"LicenseSnapshot(version={self.version}, tenant={self.tenant!r}, plan={self.plan!r}, "
+                f"agents={sorted(self.agents)}, rate_limit={self.rate_limit}, "
+                f"expires_at={self.expires_at!r}, server_verified={self.server_verified})")
+
+
+def parse_expiry(expires_str) -> float:
+    """Return the expiry as a UTC epoch; naive timestamps are treated as UTC and
+    unparseable values never expire."""
+    if not expires_str:
+        return math.inf
+    try:
+        expires_at = datetime.fromisoformat(expires_str.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return math.inf
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
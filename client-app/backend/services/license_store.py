@@ -1,12 +1,179 @@
-# Global license storage
-_current_license = None
-
-def set_license(license_data):
-    global _current_license
-    _current_license = license_data
-    print(f"DEBUG: License stored globally: {license_data}")
-
-def get_license():
-    global _current_license
-    print(f"DEBUG: License retrieved globally: {_current_license}")
-    return _current_license
\ No newline at end of file
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from services.license_snapshot import LicenseSnapshot
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+TENANT_HEADER = "x-tenant-id"
+API_KEY_HEADER = "x-api-key"
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+def resolve_tenant(tenant_id: str = None, api_key: str = None) -> str:
+    """Pick the tenant for a request.
+
+    An API key always decides the tenant; a tenant id sent with it must name
+    the same tenant. A tenant id on its own is taken as-is, so ``X-Tenant-ID``
+    must only be set by a trusted proxy that strips it from client requests.
+    """
+    if tenant_id and (not _TENANT_ID.match(tenant_id) or tenant_id in (".", "..")):
+        raise ValueError("Invalid tenant id")
+    if api_key:
+        # Never keep raw API keys around as store keys or file names.
+        tenant = "key-" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        if tenant_id and tenant_id != tenant:
+            raise ValueError("Tenant id does not match API key")
+        return tenant
+    return tenant_id or DEFAULT_TENANT
+
+class TenantLicenseStore:
+    """Validated licenses per tenant with O(1) lookup.
+
+    Each tenant holds its license dict and a compiled ``LicenseSnapshot``
+    (entitlements as an agent bitmask). At most ``max_tenants`` are kept;
+    the least recently used tenant is evicted and reloaded on demand through
+    ``loader`` the next time it is requested.
+
+    A failed load leaves a negative entry for the tenant: no further loads are
+    started for ``failure_ttl`` seconds, doubling on each consecutive failure
+    up to ``max_failure_ttl``.
+    """
+
+    def __init__(self, max_tenants: int = 1024, loader=None, failure_ttl: float = 5.0,
+                 max_failure_ttl: float = 300.0, clock=time.monotonic):
+        self.max_tenants = max_tenants
+        self.loader = loader
+        self.failure_ttl = failure_ttl
+        self.max_failure_ttl = max_failure_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        # tenant -> (retry_at, consecutive failures) for tenants whose last load failed.
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._flights = SingleFlight()
+        self._background = set()
+        self._loading = set()
+
+    def set(self, tenant: str, license_data: dict):
+        with self._lock:
+            self._version += 1
+            if not license_data:
+                self._entries.pop(tenant, None)
+                return None
+            snapshot = LicenseSnapshot.compile(license_data, self._version, tenant)
+            self._failures.pop(tenant, None)
+            # Publish license and snapshot together with one assignment.
+            self._entries[tenant] = (license_data, snapshot)
+            self._entries.move_to_end(tenant)
+            while len(self._entries) > self.max_tenants:
+                self._entries.popitem(last=False)
+            return snapshot
+
+    def get(self, tenant: str):
+        entry = self._touch(tenant)
+        return entry[0] if entry else None
+
+    def get_snapshot(self, tenant: str):
+        entry = self._touch(tenant)
+        return entry[1] if entry else None
+
+    async def resolve_snapshot(self, tenant: str):
+        snapshot = self.get_snapshot(tenant)
+        if snapshot is not None or self.loader is None:
+            return snapshot
+        return await self._flights.do(tenant, lambda: self._reload(tenant))
+
+    def load_in_background(self, tenant: str) -> bool:
+        """Start loading ``tenant`` through ``loader`` without waiting for it.
+
+        Returns ``False`` when there is no loader or the tenant's last load
+        failed recently; ``True`` while a load is pending.
+        """
+        if self.loader is None or self.load_failed(tenant):
+            return False
+        if tenant in self._loading:
+            return True
+        self._loading.add(tenant)
+        task = asyncio.ensure_future(self.resolve_snapshot(tenant))
+        self._background.add(task)
+        task.add_done_callback(lambda t, tenant=tenant: self._background_done(tenant, t))
+        return True
+
+    def load_failed(self, tenant: str) -> bool:
+        """Whether ``tenant`` has a live negative entry from a failed load."""
+        failure = self._failures.get(tenant)
+        return failure is not None and self._clock() < failure[0]
+
+    def tenants(self) -> list:
+        return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _touch(self, tenant):
+        entry = self._entries.get(tenant)
+        if entry is not None:
+            try:
+                self._entries.move_to_end(tenant)
+            except KeyError:
+                pass
+        return entry
+
+    def _background_done(self, tenant, task):
+        self._background.discard(task)
+        self._loading.discard(tenant)
+
+    def _record_failure(self, tenant):
+        with self._lock:
+            previous = self._failures.pop(tenant, None)
+            failures = previous[1] + 1 if previous else 1
+            ttl = min(self.max_failure_ttl, self.failure_ttl * 2 ** (failures - 1))
+            self._failures[tenant] = (self._clock() + ttl, failures)
+            while len(self._failures) > self.max_tenants:
+                self._failures.popitem(last=False)
+
+    async def _reload(self, tenant):
+        try:
+            license_data = await self.loader(tenant)
+        except Exception as e:
+            logger.warning("Failed to reload license for tenant %s: %s", tenant, e)
+            self._record_failure(tenant)
+            return None
+        if not license_data:
+            self._record_failure(tenant)
+            return None
+        return self.get_snapshot(tenant) or self.set(tenant, license_data)
+
+store = TenantLicenseStore(
+    max_tenants=int(os.getenv("LICENSE_MAX_TENANTS", "1024")),
+    failure_ttl=float(os.getenv("LICENSE_LOAD_FAILURE_TTL", "5")),
+    max_failure_ttl=float(os.getenv("LICENSE_LOAD_FAILURE_MAX_TTL", "300")),
+)
+
+def set_loader(loader):
+    store.loader = loader
+
+def set_license(license_data, tenant: str = DEFAULT_TENANT):
+    store.set(tenant, license_data)
+    logger.debug("License stored for tenant %s: %s", tenant, license_data)
+
+def get_license(tenant: str = DEFAULT_TENANT):
+    return store.get(tenant)
+
+def get_snapshot(tenant: str = DEFAULT_TENANT):
+    return store.get_snapshot(tenant)
+
+async def resolve_snapshot(tenant: str = DEFAULT_TENANT):
+    return await store.resolve_snapshot(tenant)
+
+def load_in_background(tenant: str = DEFAULT_TENANT) -> bool:
+    return store.load_in_background(tenant)
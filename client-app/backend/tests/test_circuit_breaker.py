@@ -0,0 +1,97 @@
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, backoff=1.0, max_backoff=8.0, jitter=0.0)
+    options.update(kwargs)
+    return CircuitBreaker("test", clock=clock, **options)
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker(FakeClock())
+    fail(breaker, 3)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_failure_rate():
+    breaker = make_breaker(FakeClock())
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_success()
+    fail(breaker, 1)
+    assert breaker.state == CLOSED
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 1.0
+
+
+def test_half_open_probe_closes_on_success():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now = 1.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # Only one probe at a time.
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_backoff_up_to_max():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    for expected in (2.0, 4.0, 8.0, 8.0):
+        clock.now += breaker.retry_after()
+        fail(breaker, 1)
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == expected
+
+
+def test_success_resets_backoff():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now += 1.0
+    fail(breaker, 1)
+    clock.now += 2.0
+    assert breaker.allow()
+    breaker.record_success()
+    fail(breaker, 4)
+    assert breaker.retry_after() == 1.0
+
+
+def test_release_returns_half_open_probe():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now = 1.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_jitter_stays_within_bounds():
+    clock = FakeClock()
+    for _ in range(50):
+        breaker = make_breaker(clock, jitter=0.2)
+        fail(breaker, 4)
+        assert 0.8 <= breaker.retry_after() <= 1.2
@@ -0,0 +1,25 @@
+import os
+
+from utils.file_utils import _UMASK, atomic_write_bytes
+
+
+def test_replaces_content(tmp_path):
+    path = tmp_path / "license.lic"
+    atomic_write_bytes(path, b"one")
+    atomic_write_bytes(path, b"two")
+    assert path.read_bytes() == b"two"
+    assert [p.name for p in tmp_path.iterdir()] == ["license.lic"]
+
+
+def test_new_file_gets_default_mode(tmp_path):
+    path = tmp_path / "licenses" / "t.lic"
+    atomic_write_bytes(path, b"data")
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~_UMASK
+
+
+def test_keeps_existing_mode(tmp_path):
+    path = tmp_path / "license.lic"
+    path.write_bytes(b"old")
+    os.chmod(path, 0o640)
+    atomic_write_bytes(path, b"new")
+    assert os.stat(path).st_mode & 0o777 == 0o640
@@ -0,0 +1,116 @@
+import multiprocessing
+
+import pytest
+
+from utils.rate_limiter import SharedMemoryRateLimiter, SlidingWindowRateLimiter
+
+
+@pytest.fixture(params=["memory", "shared"])
+def limiter(request, tmp_path):
+    if request.param == "memory":
+        yield SlidingWindowRateLimiter(window=60, buckets=60)
+        return
+    limiter = SharedMemoryRateLimiter(path=str(tmp_path / "rate-limit.bin"), window=60, buckets=60)
+    yield limiter
+    limiter.close()
+
+
+def test_acquire_grants_up_to_limit(limiter):
+    assert limiter.acquire("k", 10, 4, now=0.5) == 4
+    assert limiter.acquire("k", 10, 10, now=0.5) == 6
+    assert limiter.acquire("k", 10, 1, now=0.5) == 0
+    assert not limiter.check("k", 10, now=0.5)
+    assert limiter.remaining("other", 10, now=0.5) == 10
+
+
+def test_window_expiry(limiter):
+    limiter.acquire("k", 10, 6, now=0.5)
+    limiter.acquire("k", 10, 4, now=30.5)
+    assert limiter.remaining("k", 10, now=59.5) == 0
+    # The first bucket leaves the window after 60s, the second 30s later.
+    assert limiter.remaining("k", 10, now=60.5) == 6
+    assert limiter.remaining("k", 10, now=90.5) == 10
+    assert limiter.acquire("k", 10, 10, now=500) == 10
+
+
+def test_release_refunds_newest_hits(limiter):
+    limiter.acquire("k", 10, 6, now=0.5)
+    limiter.acquire("k", 10, 4, now=30.5)
+    limiter.release("k", 3, now=31.5)
+    assert limiter.remaining("k", 10, now=31.5) == 3
+    # Refunds come from the newest buckets, so the older hits still expire on time.
+    assert limiter.remaining("k", 10, now=60.5) == 9
+
+
+def test_memory_limiter_evicts_least_recently_used():
+    limiter = SlidingWindowRateLimiter(window=60, buckets=60, max_keys=2)
+    limiter.acquire("a", 1, now=0.5)
+    limiter.acquire("b", 1, now=0.5)
+    limiter.acquire("a", 1, now=0.5)
+    limiter.acquire("c", 1, now=0.5)
+    assert len(limiter) == 2
+    # "b" was least recently used; it comes back with a fresh window.
+    assert limiter.acquire("b", 1, now=0.5) == 1
+    assert limiter.acquire("c", 1, now=0.5) == 0
+
+
+def test_memory_limiter_drops_idle_keys():
+    limiter = SlidingWindowRateLimiter(window=60, buckets=60)
+    limiter.acquire("idle", 1, now=0.5)
+    limiter.acquire("busy", 1, now=61.5)
+    assert len(limiter) == 1
+
+
+def test_shared_limiter_evicts_oldest_slot_when_probe_window_is_full(tmp_path):
+    limiter = SharedMemoryRateLimiter(path=str(tmp_path / "rate-limit.bin"), window=60, buckets=60,
+                                      stripes=1, slots_per_stripe=4, probe=4)
+    try:
+        for tick, key in enumerate("abcd"):
+            assert limiter.acquire(key, 1, now=tick + 0.5) == 1
+        # Every slot is live; a new key takes over the least recently touched one ("a").
+        assert limiter.acquire("e", 1, now=4.5) == 1
+        assert limiter.acquire("e", 1, now=4.5) == 0
+        assert limiter.acquire("d", 1, now=4.5) == 0
+        assert limiter.remaining("a", 1, now=4.5) == 1
+        # "a"'s counts were cleared when "e" took its slot, so they never expire out of "e"'s total.
+        assert limiter.remaining("e", 2, now=60.5) == 1
+    finally:
+        limiter.close()
+
+
+def test_shared_limiter_reuses_idle_slots(tmp_path):
+    limiter = SharedMemoryRateLimiter(path=str(tmp_path / "rate-limit.bin"), window=60, buckets=60,
+                                      stripes=1, slots_per_stripe=2, probe=2)
+    try:
+        limiter.acquire("a", 1, now=0.5)
+        limiter.acquire("b", 1, now=30.5)
+        # "a" has been idle for a full window, so "c" takes its slot rather than "b"'s.
+        assert limiter.acquire("c", 1, now=61.5) == 1
+        assert limiter.remaining("b", 1, now=61.5) == 0
+    finally:
+        limiter.close()
+
+
+def _hammer(path, key, limit, attempts, now, results):
+    limiter = SharedMemoryRateLimiter(path=path, window=60, buckets=60)
+    try:
+        results.put(sum(limiter.acquire(key, limit, 1, now=now) for _ in range(attempts)))
+    finally:
+        limiter.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_shared_limiter_holds_quota_across_processes(tmp_path):
+    path = str(tmp_path / "rate-limit.bin")
+    SharedMemoryRateLimiter(path=path, window=60, buckets=60).close()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_hammer, args=(path, ("tenant", "license", "agent"), 100, 60, 10.5, results))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    granted = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+    assert sum(granted) == 100
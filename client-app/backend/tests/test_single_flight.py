@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+class Work:
+    """Counts calls and blocks each one until ``release`` is set."""
+
+    def __init__(self, result="ok", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.ensure_future(flights.do("k", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.inflight() == 1
+        work.release.set()
+        assert await asyncio.gather(*callers) == ["ok"] * 5
+        assert work.calls == 1
+        await asyncio.sleep(0)
+        assert flights.inflight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_distinct_keys_run_separately():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        work.release.set()
+        await asyncio.gather(flights.do("a", work), flights.do("b", work))
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_every_caller():
+    async def scenario():
+        flights, work = SingleFlight(), Work(error=ValueError("boom"))
+        callers = [asyncio.ensure_future(flights.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError] * 3
+        assert work.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_next_call_after_completion_runs_again():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        work.release.set()
+        await flights.do("k", work)
+        await asyncio.sleep(0)
+        await flights.do("k", work)
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_caller_keeps_work_for_others():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        first = asyncio.ensure_future(flights.do("k", work))
+        second = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        assert await second == "ok"
+        assert work.cancelled == 0
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_last_caller_cancels_work():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.ensure_future(flights.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert work.cancelled == 1
+        assert flights.inflight() == 0
+        # A new caller starts fresh instead of joining the cancelled task.
+        work.release.set()
+        assert await flights.do("k", work) == "ok"
+        assert work.calls == 2
+
+    asyncio.run(scenario())
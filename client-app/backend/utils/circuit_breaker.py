@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from collections import deque
+from utils.metrics import circuit_breaker_rejections, circuit_breaker_state, circuit_breaker_transitions
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for calls to a remote dependency.
+
+    Closed: calls pass and their outcomes fill a window of the last
+    ``window`` calls; once at least ``min_calls`` are recorded and the
+    failure fraction reaches ``failure_rate``, the breaker opens.
+    Open: calls are rejected until a backoff expires, then the breaker goes
+    half-open and lets ``half_open_probes`` probe calls through. A successful
+    probe closes it; a failed one reopens it with the backoff doubled (up to
+    ``max_backoff``, with +/-``jitter`` randomisation).
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 backoff: float = 1.0, max_backoff: float = 60.0, jitter: float = 0.2,
+                 half_open_probes: int = 1, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened = 0
+        self._open_until = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        circuit_breaker_state.set(_STATE_VALUES[CLOSED], (name,))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        with self._lock:
+            return max(0.0, self._open_until - self._clock()) if self._state == OPEN else 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; every allowed call must be followed by
+        ``record_success``, ``record_failure`` or ``release``."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() < self._open_until:
+                    circuit_breaker_rejections.inc((self.name,))
+                    return False
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    circuit_breaker_rejections.inc((self.name,))
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._opened = 0
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            elif self._state == CLOSED:
+                self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+            elif self._state == CLOSED:
+                self._outcomes.append(False)
+                failures = self._outcomes.count(False)
+                if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def release(self):
+        """End an allowed call without an outcome (e.g. it was cancelled),
+        giving back its half-open probe."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def _open(self):
+        self._opened += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** (self._opened - 1))
+        self._open_until = self._clock() + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self._outcomes.clear()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        self._state = state
+        self._probes = 0
+        circuit_breaker_state.set(_STATE_VALUES[state], (self.name,))
+        circuit_breaker_transitions.inc((self.name, state))
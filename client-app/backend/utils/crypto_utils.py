@@ -1,7 +1,9 @@
 import json
 import base64
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
+import functools
+import hashlib
+import os
+from utils.ttl_cache import TTLCache
 
 PUBLIC_KEY_PEM = """-----BEGIN PUBLIC KEY-----
 MIIBIjANBgkqhkiG9w0BAQEFAAOCAQ8AMIIBCgKCAQEAq7wbETwQh02pw2/fncPK
@@ -13,51 +15,66 @@ vMam3QpJjgeN8ZBlfjcQV6pjDJ1LZQ9cae5oLIUzH42hkzmck/PX9fTWhs/Opz5l
 cwIDAQAB
 -----END PUBLIC KEY-----"""
 
+# Outcomes of RSA-PSS verification keyed by a digest of (data, signature).
+verification_cache = TTLCache(
+    maxsize=int(os.getenv("LICENSE_VERIFY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LICENSE_VERIFY_CACHE_TTL", "300")),
+)
+
+def verification_digest(data: bytes, signature: bytes) -> bytes:
+    h = hashlib.sha256(len(data).to_bytes(8, "big"))
+    h.update(data)
+    h.update(signature)
+    return h.digest()
+
 class CryptoUtils:
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def load_public_key():
+        # ``cryptography`` is imported on first use (or during warm-up) to keep cold starts cheap.
+        from cryptography.hazmat.primitives import serialization
         return serialization.load_pem_public_key(PUBLIC_KEY_PEM.encode())
-    
+
+    @staticmethod
+    def verify(data: bytes, signature: bytes) -> bool:
+        digest = verification_digest(data, signature)
+        verified = verification_cache.get(digest)
+        if verified is None:
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.asymmetric import padding
+            try:
+                CryptoUtils.load_public_key().verify(
+                    signature,
+                    data,
+                    padding.PSS(
+                        mgf=padding.MGF1(hashes.SHA256()),
+                        salt_length=padding.PSS.MAX_LENGTH
+                    ),
+                    hashes.SHA256()
+                )
+                verified = True
+            except Exception:
+                verified = False
+            verification_cache.set(digest, verified)
+        return verified
+
     @staticmethod
     def decrypt_license_data(encrypted_data: str) -> dict:
-        public_key = CryptoUtils.load_public_key()
-        
         try:
             combined_data = json.loads(base64.b64decode(encrypted_data))
             data_bytes = base64.b64decode(combined_data["data"])
             signature = base64.b64decode(combined_data["signature"])
-            
-            public_key.verify(
-                signature,
-                data_bytes,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
-            
+
+            if not CryptoUtils.verify(data_bytes, signature):
+                raise ValueError("Invalid signature")
+
             return json.loads(data_bytes.decode('utf-8'))
-            
+
         except Exception as e:
             raise ValueError(f"License decryption failed: {str(e)}")
-    
+
     @staticmethod
     def verify_license_signature(data: dict, signature_hex: str) -> bool:
-        public_key = CryptoUtils.load_public_key()
         message = json.dumps(data, sort_keys=True).encode("utf-8")
         signature = bytes.fromhex(signature_hex)
-
-        try:
-            public_key.verify(
-                signature,
-                message,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
-            return True
-        except Exception:
-            return False
\ No newline at end of file
+        return CryptoUtils.verify(message, signature)
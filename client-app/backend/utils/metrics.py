@@ -0,0 +1,180 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond hot-path checks to slow
+# license-server round-trips.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MICRO_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+                 0.0001, 0.00025, 0.0005, 0.001)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0.0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, labels=(), amount=1.0):
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, labels=()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def collect(self):
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                label_str = _format_labels(self.labelnames, labels, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{label_str} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(total)}"
+            yield f"{self.name}_count{label_str} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+license_decisions = registry.counter(
+    "license_middleware_decisions_total", "LicenseMiddleware outcomes for protected requests", ("outcome",))
+rate_limit_checks = registry.counter(
+    "rate_limiter_checks_total", "Rate limiter checks by result", ("result",))
+rate_limit_check_duration = registry.histogram(
+    "rate_limiter_check_duration_seconds", "Time spent in a rate limiter check", buckets=MICRO_BUCKETS)
+license_validation_stage_duration = registry.histogram(
+    "license_validation_stage_duration_seconds", "Time spent per license validation stage", ("stage",))
+license_reverifications = registry.counter(
+    "license_reverifications_total", "Background license re-verifications by outcome", ("outcome",))
+agent_chat_duration = registry.histogram(
+    "agent_chat_duration_seconds", "AgentManager.chat_with_agent latency", ("agent",))
+agent_response_cache_lookups = registry.counter(
+    "agent_response_cache_lookups_total", "Agent response cache lookups by result", ("agent", "result"))
+agent_queue_depth = registry.gauge(
+    "agent_executor_queue_depth", "Agent calls waiting for a concurrency slot", ("agent",))
+agent_in_flight = registry.gauge(
+    "agent_executor_in_flight", "Agent calls currently running", ("agent",))
+agent_queue_wait = registry.histogram(
+    "agent_executor_wait_seconds", "Time agent calls spent waiting for a slot", ("agent",))
+agent_rejected = registry.counter(
+    "agent_executor_rejected_total", "Agent calls shed because the wait queue was full", ("agent",))
+circuit_breaker_state = registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state (0 closed, 1 open, 2 half-open)", ("name",))
+circuit_breaker_transitions = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes by new state", ("name", "state"))
+circuit_breaker_rejections = registry.counter(
+    "circuit_breaker_rejections_total", "Calls rejected by an open circuit breaker", ("name",))
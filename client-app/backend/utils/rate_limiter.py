@@ -0,0 +1,312 @@
+import functools
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SlidingWindowRateLimiter:
+    """Per-key sliding window counters split into fixed time buckets.
+
+    Each key owns a ring of ``buckets`` counters covering ``window`` seconds
+    plus a running total, so a check only touches the buckets that expired
+    since the key was last seen. Keys idle for a full window are dropped and
+    at most ``max_keys`` keys are tracked (least recently used go first).
+    """
+
+    def __init__(self, window: float = 60.0, buckets: int = 60, max_keys: int = 100_000):
+        self.window = window
+        self.buckets = buckets
+        self.bucket_width = window / buckets
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key, limit: int, now: float = None) -> bool:
+        return self.acquire(key, limit, 1, now) == 1
+
+    def acquire(self, key, limit: int, count: int = 1, now: float = None) -> int:
+        """Reserve up to ``count`` hits for ``key`` and return how many were granted."""
+        if now is None:
+            now = time.monotonic()
+        tick = int(now / self.bucket_width)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [tick, 0, [0] * self.buckets]
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+                self._advance(entry, tick)
+
+            granted = min(count, max(limit - entry[1], 0))
+            if granted:
+                entry[2][tick % self.buckets] += granted
+                entry[1] += granted
+
+            self._evict(tick)
+            return granted
+
+    def release(self, key, count: int, now: float = None):
+        """Give back ``count`` hits reserved for ``key`` that were not used,
+        newest buckets first."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            tick = int(now / self.bucket_width)
+            self._advance(entry, tick)
+            entry[1] -= _refund(entry[2], tick, count)
+
+    def remaining(self, key, limit: int, now: float = None) -> int:
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return limit
+            self._advance(entry, int(now / self.bucket_width))
+            return max(limit - entry[1], 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _advance(self, entry, tick):
+        last_tick, _, counts = entry
+        elapsed = tick - last_tick
+        if elapsed <= 0:
+            return
+        if elapsed >= self.buckets:
+            for i in range(self.buckets):
+                counts[i] = 0
+            entry[1] = 0
+        else:
+            for t in range(last_tick + 1, tick + 1):
+                slot = t % self.buckets
+                entry[1] -= counts[slot]
+                counts[slot] = 0
+        entry[0] = tick
+
+    def _evict(self, tick):
+        # Entries are kept in access order, so idle keys are always at the front.
+        entries = self._entries
+        while len(entries) > self.max_keys:
+            entries.popitem(last=False)
+        while entries:
+            oldest = next(iter(entries.values()))
+            if tick - oldest[0] < self.buckets:
+                break
+            entries.popitem(last=False)
+
+
+class SharedMemoryRateLimiter:
+    """Sliding window counters kept in a memory-mapped file shared by every
+    worker process on the host.
+
+    The table is split into lock stripes; each stripe is guarded by an
+    ``fcntl`` byte-range lock (between processes) and a ``threading.Lock``
+    (between threads of one process). A key hashes to a stripe and is
+    probed over ``probe`` slots within it. Idle slots are reused and, when
+    the probe window is full, the least recently touched slot is evicted.
+    """
+
+    _HEADER = struct.Struct("<QqI")
+    _COUNT = struct.Struct("<I")
+
+    def __init__(self, path: str = None, window: float = 60.0, buckets: int = 60,
+                 stripes: int = 64, slots_per_stripe: int = 256, probe: int = 16):
+        if fcntl is None:
+            raise RuntimeError("Shared rate limiter requires fcntl (POSIX only)")
+        self.window = window
+        self.buckets = buckets
+        self.bucket_width = window / buckets
+        self.stripes = stripes
+        self.slots_per_stripe = slots_per_stripe
+        self.probe = min(probe, slots_per_stripe)
+        # Slot layout: header, then one uint32 counter per bucket.
+        self._zero_counts = bytes(buckets * self._COUNT.size)
+        self.slot_size = self._HEADER.size + len(self._zero_counts)
+        self.path = path or default_shared_path()
+
+        size = stripes * slots_per_stripe * self.slot_size
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+
+    def check(self, key, limit: int, now: float = None) -> bool:
+        return self.acquire(key, limit, 1, now) == 1
+
+    def acquire(self, key, limit: int, count: int = 1, now: float = None) -> int:
+        if now is None:
+            now = time.monotonic()
+        tick = int(now / self.bucket_width)
+        key_hash = self._hash(key)
+        stripe = key_hash % self.stripes
+
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                # Only the header and the buckets that change are read or written.
+                offset, header = self._find_slot(stripe, key_hash, tick)
+                if header is not None:
+                    total = self._expire(offset, *header, tick)
+                else:
+                    self._map[offset + self._HEADER.size:offset + self.slot_size] = self._zero_counts
+                    total = 0
+
+                granted = min(count, max(limit - total, 0))
+                if granted:
+                    at = self._bucket(offset, tick)
+                    self._COUNT.pack_into(self._map, at, self._COUNT.unpack_from(self._map, at)[0] + granted)
+                    total += granted
+                self._HEADER.pack_into(self._map, offset, key_hash, tick, total)
+                return granted
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def release(self, key, count: int, now: float = None):
+        if now is None:
+            now = time.monotonic()
+        tick = int(now / self.bucket_width)
+        key_hash = self._hash(key)
+        stripe = key_hash % self.stripes
+
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                offset, header = self._find_slot(stripe, key_hash, tick)
+                if header is None:
+                    return
+                total = self._expire(offset, *header, tick)
+                # Newest buckets first, as in _refund.
+                for t in range(tick, tick - self.buckets, -1):
+                    if not count:
+                        break
+                    at = self._bucket(offset, t)
+                    current = self._COUNT.unpack_from(self._map, at)[0]
+                    take = min(count, current)
+                    if take:
+                        self._COUNT.pack_into(self._map, at, current - take)
+                        total -= take
+                        count -= take
+                self._HEADER.pack_into(self._map, offset, key_hash, tick, total)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def remaining(self, key, limit: int, now: float = None) -> int:
+        if now is None:
+            now = time.monotonic()
+        tick = int(now / self.bucket_width)
+        key_hash = self._hash(key)
+        stripe = key_hash % self.stripes
+
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_SH, 1, stripe)
+            try:
+                offset, header = self._find_slot(stripe, key_hash, tick)
+                if header is None:
+                    return limit
+                return max(limit - self._expire(offset, *header, tick, write=False), 0)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def _hash(self, key):
+        return _key_hash(key)
+
+    def _find_slot(self, stripe, key_hash, tick):
+        """Return ``(offset, (last_tick, total))`` for the key's slot, or
+        ``(offset, None)`` with the slot a new key should take."""
+        base = stripe * self.slots_per_stripe
+        start = key_hash // self.stripes
+        free = None
+        oldest = None
+        for i in range(self.probe):
+            offset = (base + (start + i) % self.slots_per_stripe) * self.slot_size
+            slot_hash, last_tick, total = self._HEADER.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, (last_tick, total)
+            if free is None and (slot_hash == 0 or tick - last_tick >= self.buckets):
+                free = offset
+            if oldest is None or last_tick < oldest[0]:
+                oldest = (last_tick, offset)
+        return (free if free is not None else oldest[1]), None
+
+    def _bucket(self, offset, tick):
+        return offset + self._HEADER.size + (tick % self.buckets) * self._COUNT.size
+
+    def _expire(self, offset, last_tick, total, tick, write=True):
+        """Drop buckets that left the window since ``last_tick`` from ``total``,
+        zeroing them in place when ``write`` is set."""
+        elapsed = tick - last_tick
+        if elapsed <= 0:
+            return total
+        if elapsed >= self.buckets:
+            if write:
+                self._map[offset + self._HEADER.size:offset + self.slot_size] = self._zero_counts
+            return 0
+        for t in range(last_tick + 1, tick + 1):
+            at = self._bucket(offset, t)
+            count = self._COUNT.unpack_from(self._map, at)[0]
+            if count:
+                total -= count
+                if write:
+                    self._COUNT.pack_into(self._map, at, 0)
+        return total
+
+
+@functools.lru_cache(maxsize=65536)
+def _key_hash(key):
+    # Stable across processes (unlike hash()); memoized since keys repeat per request.
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def _refund(counts, tick, count):
+    # Take hits back from the newest buckets first; returns how many were refunded.
+    refunded = 0
+    buckets = len(counts)
+    for t in range(tick, tick - buckets, -1):
+        slot = t % buckets
+        take = min(count - refunded, counts[slot])
+        counts[slot] -= take
+        refunded += take
+        if refunded == count:
+            break
+    return refunded
+
+
+def default_shared_path():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "client-app-rate-limit.bin")
+
+
+def create_rate_limiter():
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "shared":
+        return SharedMemoryRateLimiter(path=os.getenv("RATE_LIMIT_SHM_PATH"))
+    if backend == "memory":
+        return SlidingWindowRateLimiter()
+    raise ValueError(f"Unknown rate limit backend: {backend}")
@@ -0,0 +1,72 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU/TTL cache of agent replies keyed by agent and message digest.
+
+    Besides ``maxsize`` entries, the cache keeps the summed size of cached
+    replies under ``max_bytes``; least recently used entries go first.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, max_bytes: int = 16 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(agent_name: str, message: str):
+        return agent_name, hashlib.blake2b(message.encode(), digest_size=16).digest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, size, value = item
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value: str, ttl: float = None):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires, size, value)
+            self._bytes += size
+            while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, agent_name: str = None):
+        with self._lock:
+            for key in [k for k in self._data if agent_name is None or k[0] == agent_name]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "bytes": self._bytes,
+                "max_bytes": self.max_bytes, "ttl": self.ttl, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        self._bytes -= self._data.pop(key)[1]
@@ -0,0 +1,51 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and receive its result or exception.
+    The shared task is shielded, so one caller being cancelled does not
+    cancel the work for the others; once every caller has been cancelled,
+    the task is cancelled too and the next caller starts a fresh one.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiters = {}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[task] = 0
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._leave(key, task)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _leave(self, key, task):
+        if task.done():
+            return
+        self._waiters[task] -= 1
+        if self._waiters[task] == 0:
+            # Nobody is waiting any more; stop the work and let the next
+            # caller start over rather than join a cancelled task.
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            task.cancel()
+
+    def _finish(self, key, task):
+        self._waiters.pop(task, None)
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the outcome as retrieved even if every waiter was cancelled.
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,75 @@
+import hashlib
+import io
+from typing import NamedTuple, Optional
+
+KEY_HEADER = b"# Key:"
+ENCRYPTED_DATA_HEADER = b"# EncryptedData:"
+DATA_HEADER = b"# Data:"
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_LINE = 1024 * 1024
+
+class LicenseFile(NamedTuple):
+    """Headers of a ``.lic`` file plus a digest of its raw bytes."""
+    path: Optional[str]
+    key: Optional[str]
+    encrypted_data: Optional[str]
+    data: Optional[str]
+    digest: str
+    size: int
+    content: Optional[bytes] = None
+
+def parse_license_file(path) -> LicenseFile:
+    with open(path, "rb") as f:
+        return parse_license_stream(f, str(path))
+
+def parse_license_bytes(content: bytes, path: str = None, digest: str = None) -> LicenseFile:
+    """Parse an in-memory license; pass ``digest`` when the SHA-256 was
+    already computed (e.g. while streaming an upload) to skip re-hashing."""
+    license_file = parse_license_stream(io.BytesIO(content), path, digest)
+    return license_file._replace(content=content)
+
+class _NoHash:
+    def update(self, data):
+        pass
+
+def parse_license_stream(stream, path: str = None, known_digest: str = None) -> LicenseFile:
+    """Read a license once: header lines are parsed until ``# Key:``,
+    ``# EncryptedData:`` and ``# Data:`` have all been seen, after which the
+    rest of the file is only hashed in fixed-size chunks."""
+    digest = _NoHash() if known_digest else hashlib.sha256()
+    size = 0
+    headers = {}
+    mid_line = False
+
+    while len(headers) < 3:
+        line = stream.readline(MAX_HEADER_LINE)
+        if not line:
+            break
+        digest.update(line)
+        size += len(line)
+        # Lines longer than MAX_HEADER_LINE are skipped, never parsed in pieces.
+        at_line_start = not mid_line
+        mid_line = not line.endswith(b"\n")
+        if not at_line_start or mid_line and len(line) == MAX_HEADER_LINE:
+            continue
+        for header in (KEY_HEADER, ENCRYPTED_DATA_HEADER, DATA_HEADER):
+            if header not in headers and line.startswith(header):
+                headers[header] = line[len(header):].strip().decode("utf-8", "replace")
+                break
+
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+
+    return LicenseFile(
+        path=path,
+        key=headers.get(KEY_HEADER) or None,
+        encrypted_data=headers.get(ENCRYPTED_DATA_HEADER) or None,
+        data=headers.get(DATA_HEADER) or None,
+        digest=known_digest or digest.hexdigest(),
+        size=size,
+    )
@@ -1,68 +1,147 @@
+import asyncio
+import functools
 import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from utils.crypto_utils import CryptoUtils
 from validators.server_validator import ServerValidator
+from validators.license_file import LicenseFile, parse_license_bytes, parse_license_file
+from utils.single_flight import SingleFlight
+from utils.metrics import license_validation_stage_duration
+from utils.ttl_cache import TTLCache
 
-try:
-    from pyarmor_runtime import verify_license, get_license_info
-    PYARMOR_AVAILABLE = True
-except ImportError:
-    PYARMOR_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=1)
+def _pyarmor_runtime():
+    """Import the PyArmor runtime on first use; ``None`` when it is not installed."""
+    try:
+        import pyarmor_runtime
+        return pyarmor_runtime
+    except ImportError:
+        return None
 
 class LicenseValidator:
     def __init__(self):
         self.license_data = None
         self.license_file_path = Path("license.lic")
         self.server_validator = ServerValidator()
+        self._flights = SingleFlight()
+        # Results of successful validations keyed by the license file's SHA-256,
+        # so re-validating unchanged content skips the pipeline.
+        self._results = TTLCache(maxsize=256, ttl=float(os.getenv("LICENSE_RESULT_CACHE_TTL", "60")))
         
     def validate_license_file(self, license_file_path: str = None) -> dict:
+        return self._validate_parsed(self._parse_license_file(license_file_path))
+
+    def validate_license_bytes(self, content: bytes, digest: str = None) -> dict:
+        return self._validate_parsed(parse_license_bytes(content, digest=digest))
+
+    def _validate_parsed(self, license_file: LicenseFile) -> dict:
+        result = self._results.get(license_file.digest)
+        if result is not None:
+            return result
         try:
-            if license_file_path:
-                self.license_file_path = Path(license_file_path)
-                
-            if not self.license_file_path.exists():
-                raise ValueError("License file not found")
-                
-            print(f"DEBUG: Extracting license data from {self.license_file_path}")
-            
-            # Debug: Show file content
-            with open(self.license_file_path, 'r') as f:
-                content = f.read()
-                print(f"DEBUG: License file content preview: {content[:500]}...")
-            
-            license_data = self._extract_license_data()
-            print(f"DEBUG: Extracted license data: {license_data}")
-            
-            license_key = self.server_validator.extract_license_key_from_file(str(self.license_file_path))
-            print(f"DEBUG: Extracted license key: {license_key}")
-            
+            license_data, license_key = self._load_local_license(license_file)
+            server_validation = None
             if license_key:
-                print("DEBUG: Validating with server...")
-                server_validation = self.server_validator.validate_license_with_server(license_key)
-                print(f"DEBUG: Server validation result: {server_validation}")
-                
-                if server_validation.get("valid", False) and server_validation.get("server_verified", False):
-                    server_license_data = server_validation["license_data"]
-                    self.license_data = {
-                        "plan": server_license_data["plan_name"],
-                        "agents": server_license_data["agents"],
-                        "rate_limit_per_min": license_data["rate_limit_per_min"],
-                        "expires_at": server_license_data["expires_at"],
-                        "server_verified": True
-                    }
-                else:
-                    print(f"DEBUG: Server validation failed: {server_validation}")
-                    # For debugging, allow fallback to local data
-                    self.license_data = {
-                        "plan": license_data.get("plan", "basic"),
-                        "agents": license_data.get("agents", ["agent1", "agent2"]),
-                        "rate_limit_per_min": license_data.get("rate_limit_per_min", 5),
-                        "expires_at": license_data.get("expires_at", "2025-12-31T23:59:59"),
-                        "server_verified": False
-                    }
-                    print(f"DEBUG: Using fallback license data: {self.license_data}")
+                logger.debug("Validating with server...")
+                with license_validation_stage_duration.time(("server",)):
+                    server_validation = self.server_validator.validate_license_with_server(license_key)
+            result = self._apply_server_validation(license_data, server_validation)
+            self._remember(license_file, result)
+            return result
+        except Exception as e:
+            logger.warning("License validation failed: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            raise e
+
+    async def validate_license_file_async(self, license_file_path: str = None) -> dict:
+        # The file is read once; concurrent validations of identical content share one run.
+        license_file = await asyncio.to_thread(self._parse_license_file, license_file_path)
+        return await self._flights.do(license_file.digest, lambda: self._validate_parsed_async(license_file))
+
+    async def validate_license_bytes_async(self, content: bytes, digest: str = None) -> dict:
+        license_file = await asyncio.to_thread(parse_license_bytes, content, None, digest)
+        return await self._flights.do(license_file.digest, lambda: self._validate_parsed_async(license_file))
+
+    async def _validate_parsed_async(self, license_file: LicenseFile) -> dict:
+        result = self._results.get(license_file.digest)
+        if result is not None:
+            return result
+        try:
+            # PyArmor/RSA checks are blocking; keep them off the event loop.
+            license_data, license_key = await asyncio.to_thread(self._load_local_license, license_file)
+            server_validation = None
+            if license_key:
+                logger.debug("Validating with server...")
+                with license_validation_stage_duration.time(("server",)):
+                    server_validation = await self.server_validator.validate_license_with_server_async(license_key)
+            result = self._apply_server_validation(license_data, server_validation)
+            self._remember(license_file, result)
+            return result
+        except Exception as e:
+            logger.warning("License validation failed: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            raise e
+
+    async def reverify_license_file_async(self, license_file_path: str):
+        """Re-check a license file against the server, bypassing the memo and
+        verdict caches. Returns ``None`` when the server gave no definitive
+        answer (unreachable or an error status), so callers keep the current verdict."""
+        license_file = await asyncio.to_thread(self._parse_license_file, license_file_path)
+        if not license_file.key:
+            return None
+        license_data, license_key = await asyncio.to_thread(self._load_local_license, license_file)
+        with license_validation_stage_duration.time(("server",)):
+            server_validation = await self.server_validator.revalidate_license_with_server_async(license_key)
+        if server_validation.get("status_code") not in (200, 404):
+            return None
+        result = self._apply_server_validation(license_data, server_validation)
+        self._results.pop(license_file.digest)
+        self._remember(license_file, result)
+        return result
+
+    def _remember(self, license_file: LicenseFile, result: dict):
+        # Unverified (fallback) results are not kept, so the next call retries the server.
+        if result.get("server_verified"):
+            self._results.set(license_file.digest, result)
+
+    def _parse_license_file(self, license_file_path: str = None) -> LicenseFile:
+        path = Path(license_file_path) if license_file_path else self.license_file_path
+        try:
+            return parse_license_file(path)
+        except FileNotFoundError:
+            raise ValueError("License file not found")
+
+    def _load_local_license(self, license_file: LicenseFile):
+        logger.debug("Extracting license data from %s (%d bytes, sha256 %s)",
+                     license_file.path, license_file.size, license_file.digest[:12])
+
+        license_data = self._extract_license_data(license_file)
+        logger.debug("Extracted license data: %s", license_data)
+
+        license_key = license_file.key
+        logger.debug("Extracted license key: %s", license_key)
+        return license_data, license_key
+
+    def _apply_server_validation(self, license_data: dict, server_validation: dict = None) -> dict:
+        if server_validation is not None:
+            logger.debug("Server validation result: %s", server_validation)
+
+            if server_validation.get("valid", False) and server_validation.get("server_verified", False):
+                server_license_data = server_validation["license_data"]
+                self.license_data = {
+                    "plan": server_license_data["plan_name"],
+                    "agents": server_license_data["agents"],
+                    "rate_limit_per_min": license_data["rate_limit_per_min"],
+                    "expires_at": server_license_data["expires_at"],
+                    "server_verified": True
+                }
             else:
-                print("DEBUG: No license key found, using fallback data")
+                logger.warning("Server validation failed: %s", server_validation.get("error"))
+                # For debugging, allow fallback to local data
                 self.license_data = {
                     "plan": license_data.get("plan", "basic"),
                     "agents": license_data.get("agents", ["agent1", "agent2"]),
@@ -70,67 +149,86 @@ class LicenseValidator:
                     "expires_at": license_data.get("expires_at", "2025-12-31T23:59:59"),
                     "server_verified": False
                 }
-            
-            return {
-                "valid": True,
-                "plan": self.license_data["plan"],
-                "agents": self.license_data["agents"],
-                "rate_limit": self.license_data["rate_limit_per_min"],
-                "expires_at": self.license_data["expires_at"],
-                "server_verified": self.license_data.get("server_verified", False)
+                logger.debug("Using fallback license data: %s", self.license_data)
+        else:
+            logger.warning("No license key found, using fallback data")
+            self.license_data = {
+                "plan": license_data.get("plan", "basic"),
+                "agents": license_data.get("agents", ["agent1", "agent2"]),
+                "rate_limit_per_min": license_data.get("rate_limit_per_min", 5),
+                "expires_at": license_data.get("expires_at", "2025-12-31T23:59:59"),
+                "server_verified": False
             }
-        except Exception as e:
-            print(f"DEBUG: License validation exception: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise e
-    
-    def _extract_license_data(self):
-        if PYARMOR_AVAILABLE:
+
+        return {
+            "valid": True,
+            "plan": self.license_data["plan"],
+            "agents": self.license_data["agents"],
+            "rate_limit": self.license_data["rate_limit_per_min"],
+            "expires_at": self.license_data["expires_at"],
+            "server_verified": self.license_data.get("server_verified", False)
+        }
+
+    def _extract_license_data(self, license_file: LicenseFile):
+        pyarmor = _pyarmor_runtime()
+        if pyarmor is not None:
             try:
-                verify_license(str(self.license_file_path))
-                info = get_license_info()
+                with license_validation_stage_duration.time(("pyarmor",)):
+                    with self._license_on_disk(license_file) as path:
+                        pyarmor.verify_license(path)
+                    info = pyarmor.get_license_info()
                 
                 if isinstance(info, dict) and 'data' in info:
                     try:
-                        return CryptoUtils.decrypt_license_data(info['data'])
+                        with license_validation_stage_duration.time(("rsa",)):
+                            return CryptoUtils.decrypt_license_data(info['data'])
                     except:
                         return json.loads(info['data'])
                 else:
-                    return self._extract_from_file_content()
+                    return self._extract_from_file_content(license_file)
             except Exception as e:
                 raise ValueError(f"PyArmor license validation failed: {str(e)}")
         else:
-            return self._extract_from_file_content()
+            return self._extract_from_file_content(license_file)
     
-    def _extract_from_file_content(self):
-        with open(self.license_file_path, 'r') as f:
-            content = f.read()
-            if '# EncryptedData:' in content:
-                data_line = [line for line in content.split('\n') if '# EncryptedData:' in line][0]
-                encrypted_data = data_line.split('# EncryptedData: ')[1]
-                try:
-                    return CryptoUtils.decrypt_license_data(encrypted_data)
-                except Exception as e:
-                    print(f"DEBUG: RSA decryption failed: {e}, trying plain JSON fallback")
-                    # Try to extract plain JSON data as fallback
-                    if '# Data:' in content:
-                        data_line = [line for line in content.split('\n') if '# Data:' in line][0]
-                        data_json = data_line.split('# Data: ')[1]
-                        return json.loads(data_json)
-                    else:
-                        raise e
-            elif '# Data:' in content:
-                data_line = [line for line in content.split('\n') if '# Data:' in line][0]
-                data_json = data_line.split('# Data: ')[1]
-                return json.loads(data_json)
-            else:
-                return {
-                    "plan": "basic",
-                    "agents": ["agent1", "agent2"],
-                    "rate_limit_per_min": 5,
-                    "expires_at": "2025-12-31T23:59:59"
-                }
+    @staticmethod
+    @contextmanager
+    def _license_on_disk(license_file: LicenseFile):
+        # PyArmor verifies a path; licenses validated from memory get a private temp file.
+        if license_file.path is not None:
+            yield license_file.path
+            return
+        fd, path = tempfile.mkstemp(suffix=".lic")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(license_file.content)
+            yield path
+        finally:
+            os.unlink(path)
+
+    def _extract_from_file_content(self, license_file: LicenseFile = None):
+        if license_file is None:
+            license_file = self._parse_license_file()
+        if license_file.encrypted_data:
+            try:
+                with license_validation_stage_duration.time(("rsa",)):
+                    return CryptoUtils.decrypt_license_data(license_file.encrypted_data)
+            except Exception as e:
+                logger.debug("RSA decryption failed: %s, trying plain JSON fallback", e)
+                # Try to extract plain JSON data as fallback
+                if license_file.data:
+                    return json.loads(license_file.data)
+                else:
+                    raise e
+        elif license_file.data:
+            return json.loads(license_file.data)
+        else:
+            return {
+                "plan": "basic",
+                "agents": ["agent1", "agent2"],
+                "rate_limit_per_min": 5,
+                "expires_at": "2025-12-31T23:59:59"
+            }
         
     def validate_license_data(self, license_data: dict) -> dict:
         self.license_data = license_data
@@ -1,51 +1,247 @@
-import requests
-from typing import Dict, Optional
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+from validators.verification_cache import VerificationCache, FRESH, STALE
+from utils.single_flight import SingleFlight
+from utils.circuit_breaker import CircuitBreaker
+from validators.license_file import parse_license_file
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+DEFAULT_SERVER_URL = os.getenv("LICENSE_SERVER_URL", "http://localhost:8000")
 
 class ServerValidator:
-    def __init__(self, server_url: str = "http://localhost:8000"):
-        self.server_url = server_url
-    
+    """Checks license keys against the subscription server.
+
+    The async path shares one keep-alive ``httpx.AsyncClient`` per validator;
+    the sync facade (for scripts) reuses a pooled ``requests.Session``. Both
+    apply separate connect and read timeouts. Verdicts are cached per license
+    key; a stale verdict is returned immediately while one background refresh
+    runs. Concurrent async lookups of the same key share one request.
+    Server calls go through a circuit breaker; while it is open, lookups
+    fail fast with the last known verdict for the key, if any.
+    """
+
+    def __init__(self, server_url: str = None, connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0, max_connections: int = 20,
+                 cache: VerificationCache = None, transport=None, breaker: CircuitBreaker = None):
+        self.server_url = server_url or DEFAULT_SERVER_URL
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.cache = cache if cache is not None else VerificationCache()
+        # Optional httpx async transport for the async client (e.g. an in-process fake server).
+        self.transport = transport
+        self.breaker = breaker if breaker is not None else CircuitBreaker(
+            "license_server",
+            window=int(os.getenv("LICENSE_SERVER_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("LICENSE_SERVER_BREAKER_MIN_CALLS", "5")),
+            failure_rate=float(os.getenv("LICENSE_SERVER_BREAKER_FAILURE_RATE", "0.5")),
+            backoff=float(os.getenv("LICENSE_SERVER_BREAKER_BACKOFF", "1")),
+            max_backoff=float(os.getenv("LICENSE_SERVER_BREAKER_MAX_BACKOFF", "60")),
+        )
+        self._client = None
+        self._session = None
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._refresh_lock = threading.Lock()
+        self._flights = SingleFlight()
+
     def validate_license_with_server(self, license_key: str) -> Dict:
+        result, state = self.cache.lookup(license_key)
+        if state == FRESH:
+            return result
+        if state == STALE:
+            if self._begin_refresh(license_key):
+                threading.Thread(target=self._refresh, args=(license_key,), daemon=True).start()
+            return result
+        return self._fetch_and_store(license_key)
+
+    async def validate_license_with_server_async(self, license_key: str) -> Dict:
+        result, state = self.cache.lookup(license_key)
+        if state == FRESH:
+            return result
+        if state == STALE:
+            if self._begin_refresh(license_key):
+                task = asyncio.create_task(self._refresh_async(license_key))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return result
+        return await self._fetch_and_store_async(license_key)
+
+    async def revalidate_license_with_server_async(self, license_key: str) -> Dict:
+        """Ask the server again regardless of the cached verdict and cache the answer."""
+        return await self._fetch_and_store_async(license_key)
+
+    def cache_stats(self) -> Dict:
+        return dict(self.cache.stats(), circuit=self.breaker.state)
+
+    def _begin_refresh(self, license_key: str) -> bool:
+        with self._refresh_lock:
+            if license_key in self._refreshing:
+                return False
+            self._refreshing.add(license_key)
+            return True
+
+    def _refresh(self, license_key: str):
+        try:
+            self._fetch_and_store(license_key)
+        finally:
+            self._refreshing.discard(license_key)
+
+    async def _refresh_async(self, license_key: str):
+        try:
+            await self._fetch_and_store_async(license_key)
+        finally:
+            self._refreshing.discard(license_key)
+
+    def _fetch_and_store(self, license_key: str) -> Dict:
+        if not self.breaker.allow():
+            return self._circuit_open(license_key)
+        try:
+            result = self._fetch(license_key)
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self._record_outcome(result)
+        self.cache.store(license_key, result)
+        return result
+
+    async def _fetch_and_store_async(self, license_key: str) -> Dict:
+        return await self._flights.do(license_key, lambda: self._fetch_and_store_once(license_key))
+
+    async def _fetch_and_store_once(self, license_key: str) -> Dict:
+        if not self.breaker.allow():
+            return self._circuit_open(license_key)
+        try:
+            result = await self._fetch_async(license_key)
+        except asyncio.CancelledError:
+            # Every caller gave up; that says nothing about the server.
+            self.breaker.release()
+            raise
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self._record_outcome(result)
+        self.cache.store(license_key, result)
+        return result
+
+    def _record_outcome(self, result: Dict):
+        # Any answer below 500 means the server is up, including "license not found".
+        if result.get("status_code", 599) < 500:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _circuit_open(self, license_key: str) -> Dict:
+        verdict = self.cache.last_verdict(license_key)
+        if verdict is not None:
+            # Without a status code the fallback is neither re-cached nor treated as a fresh answer.
+            fallback = {k: v for k, v in verdict.items() if k != "status_code"}
+            fallback["message"] = "License server circuit open; using last known verdict"
+            return fallback
+        return {
+            "valid": False,
+            "server_verified": False,
+            "error": f"Server unavailable: circuit open, retry in {self.breaker.retry_after():.1f}s",
+            "message": "Server validation required but unavailable"
+        }
+
+    def _fetch(self, license_key: str) -> Dict:
+        import requests
         try:
-            url = f"{self.server_url}/api/licenses/{license_key}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                server_data = response.json()
-                return {
-                    "valid": True,
-                    "server_verified": True,
-                    "license_data": server_data["license_data"],
-                    "message": "License verified with server"
-                }
-            elif response.status_code == 404:
-                return {
-                    "valid": False,
-                    "server_verified": False,
-                    "error": "License not found on server"
-                }
-            else:
-                return {
-                    "valid": False,
-                    "server_verified": False,
-                    "error": f"Server validation failed: {response.status_code}"
-                }
-                
+            response = self._get_session().get(
+                self._license_url(license_key),
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+            return self._interpret_response(response.status_code, response.json)
         except requests.exceptions.RequestException as e:
+            return self._unavailable(e)
+
+    async def _fetch_async(self, license_key: str) -> Dict:
+        import httpx
+        try:
+            response = await self._get_client().get(self._license_url(license_key))
+            return self._interpret_response(response.status_code, response.json)
+        except httpx.HTTPError as e:
+            return self._unavailable(e)
+
+    async def aclose(self):
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _license_url(self, license_key: str) -> str:
+        return f"{self.server_url}/api/licenses/{license_key}"
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # httpx and requests are imported when the first request is made, not at startup.
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return self._client
+
+    def _get_session(self) -> "requests.Session":
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    @staticmethod
+    def _interpret_response(status_code: int, read_json) -> Dict:
+        if status_code == 200:
+            server_data = read_json()
+            return {
+                "valid": True,
+                "server_verified": True,
+                "license_data": server_data["license_data"],
+                "message": "License verified with server",
+                "status_code": status_code
+            }
+        elif status_code == 404:
+            return {
+                "valid": False,
+                "server_verified": False,
+                "error": "License not found on server",
+                "status_code": status_code
+            }
+        else:
             return {
                 "valid": False,
                 "server_verified": False,
-                "error": f"Server unavailable: {str(e)}",
-                "message": "Server validation required but unavailable"
+                "error": f"Server validation failed: {status_code}",
+                "status_code": status_code
             }
-    
+
+    @staticmethod
+    def _unavailable(error: Exception) -> Dict:
+        return {
+            "valid": False,
+            "server_verified": False,
+            "error": f"Server unavailable: {str(error)}",
+            "message": "Server validation required but unavailable"
+        }
+
     def extract_license_key_from_file(self, license_file_path: str) -> Optional[str]:
         try:
-            with open(license_file_path, 'r') as f:
-                content = f.read()
-                for line in content.split('\n'):
-                    if line.startswith('# Key:'):
-                        return line.split('# Key: ')[1].strip()
-            return None
+            return parse_license_file(license_file_path).key
         except Exception:
-            return None
\ No newline at end of file
+            return None
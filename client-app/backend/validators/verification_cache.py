@@ -0,0 +1,73 @@
+import os
+import time
+from utils.ttl_cache import TTLCache
+
+FRESH, STALE = "fresh", "stale"
+
+class VerificationCache:
+    """License-server verdicts keyed by license key.
+
+    Positive verdicts are fresh for ``fresh_ttl`` seconds and may then be
+    served stale for another ``stale_ttl`` seconds while a refresh runs.
+    Negative verdicts (license not found) are kept for ``negative_ttl``
+    seconds and never served stale. The last definitive verdict per key is
+    also kept for ``fallback_ttl`` seconds, for use while the server is down.
+    """
+
+    def __init__(self, fresh_ttl: float = None, stale_ttl: float = None,
+                 negative_ttl: float = None, maxsize: int = 1024, fallback_ttl: float = None):
+        self.fresh_ttl = fresh_ttl if fresh_ttl is not None else float(os.getenv("LICENSE_SERVER_CACHE_TTL", "60"))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("LICENSE_SERVER_CACHE_STALE", "300"))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(os.getenv("LICENSE_SERVER_CACHE_NEGATIVE_TTL", "10"))
+        self.fallback_ttl = fallback_ttl if fallback_ttl is not None else float(os.getenv("LICENSE_SERVER_CACHE_FALLBACK_TTL", "86400"))
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = TTLCache(maxsize=maxsize, ttl=self.fresh_ttl + self.stale_ttl)
+        self._last_verdicts = TTLCache(maxsize=maxsize, ttl=self.fallback_ttl)
+
+    def lookup(self, license_key: str):
+        """Return ``(result, state)`` where state is FRESH, STALE or None on a miss."""
+        entry = self._entries.get(license_key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+        fresh_until, result = entry
+        if time.monotonic() < fresh_until:
+            self.hits += 1
+            return result, FRESH
+        self.stale_hits += 1
+        return result, STALE
+
+    def store(self, license_key: str, result: dict):
+        status_code = result.get("status_code")
+        now = time.monotonic()
+        if status_code == 200:
+            self._entries.set(license_key, (now + self.fresh_ttl, result))
+            self._last_verdicts.set(license_key, result)
+        elif status_code == 404:
+            self._entries.set(license_key, (now + self.negative_ttl, result), ttl=self.negative_ttl)
+            self._last_verdicts.set(license_key, result)
+        else:
+            # Transient failures are not cached; keep serving the last good verdict.
+            pass
+
+    def last_verdict(self, license_key: str):
+        """The most recent 200/404 verdict for ``license_key``, even if expired from the main cache."""
+        return self._last_verdicts.get(license_key)
+
+    def invalidate(self, license_key: str = None):
+        if license_key is None:
+            self._entries.clear()
+            self._last_verdicts.clear()
+        else:
+            self._entries.pop(license_key)
+            self._last_verdicts.pop(license_key)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale_hits,
+        }
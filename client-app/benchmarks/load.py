@@ -0,0 +1,183 @@
+"""In-process load test of the FastAPI app over ASGI (no sockets).
+
+The app from backend/main.py is driven through ``httpx.ASGITransport`` with
+its lifespan running, and the license server is replaced by an in-process
+fake with configurable latency and failure rate. Every scenario is run at
+each concurrency level and the throughput and latency percentiles are
+written to a JSON file so runs can be compared.
+
+    python benchmarks/load.py --concurrency 1,16,64 --requests 2000 \
+        --server-latency 20 --server-failure-rate 0.05 --output load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from support import BACKEND_DIR, FakeLicenseTransport, license_data, write_license
+
+SERVER_URL = "http://license-server.test"
+
+class Scenario:
+    def __init__(self, name, method, path, tenant=None, **request):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.headers = {"x-tenant-id": tenant} if tenant else {}
+        self.request = request
+        self._sequence = itertools.count()
+
+    async def send(self, client):
+        request = self.request
+        if "json" in request and callable(request["json"]):
+            request = dict(request, json=request["json"](next(self._sequence)))
+        return await client.request(self.method, self.path, headers=self.headers, **request)
+
+def scenarios(license_bytes):
+    return [
+        # Distinct messages so the agent response cache does not answer every call.
+        Scenario("chat", "POST", "/chat", json=lambda i: {"agent": "agent1", "message": f"load {i}"}),
+        Scenario("chat_cached", "POST", "/chat", json={"agent": "agent1", "message": "ping"}),
+        Scenario("available_agents", "GET", "/available-agents"),
+        Scenario("license_status", "GET", "/api/license/status"),
+        Scenario("license_cache_stats", "GET", "/api/license/cache-stats"),
+        Scenario("license_validate_file", "POST", "/api/license/validate-file"),
+        Scenario("license_upload", "POST", "/api/license/upload", tenant="bench-upload",
+                 files={"file": ("license.lic", license_bytes, "application/octet-stream")}),
+        Scenario("license_validate", "POST", "/api/license/validate", tenant="bench-data",
+                 json={"license_data": license_data()}),
+    ]
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run_level(client, scenario, concurrency, total, warmup):
+    for _ in range(warmup):
+        await scenario.send(client)
+
+    latencies = []
+    statuses = Counter()
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < total:
+            issued += 1
+            start = time.perf_counter()
+            response = await scenario.send(client)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+        "status_counts": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+def load_app(args):
+    # Configuration is read at import time, so set it before importing main.
+    os.environ.update({
+        "LICENSE_SERVER_URL": SERVER_URL,
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "RATE_LIMIT_BACKEND": "memory",
+    })
+    if args.server_cache_ttl is not None:
+        os.environ["LICENSE_SERVER_CACHE_TTL"] = str(args.server_cache_ttl)
+        os.environ["LICENSE_SERVER_CACHE_STALE"] = str(args.server_cache_ttl)
+        os.environ["LICENSE_SERVER_CACHE_NEGATIVE_TTL"] = str(args.server_cache_ttl)
+    sys.path.insert(0, str(BACKEND_DIR))
+    import main
+    return main
+
+async def run(args):
+    transport = FakeLicenseTransport(latency=args.server_latency / 1000, failure_rate=args.server_failure_rate,
+                                     seed=args.seed)
+    main = load_app(args)
+    main.license_service.license_validator.server_validator.transport = transport
+    license_bytes = write_license(os.getcwd()).read_bytes()
+    selected = [s for s in scenarios(license_bytes) if not args.scenarios or s.name in args.scenarios]
+
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        asgi = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=asgi, base_url="http://app.test") as client:
+            for scenario in selected:
+                for concurrency in args.concurrency:
+                    result = await run_level(client, scenario, concurrency, args.requests, args.warmup)
+                    results.append(result)
+                    latency = result["latency_ms"]
+                    print(f"{scenario.name:>22} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                          f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+                          f"{result['status_counts']}")
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "server_latency_ms": args.server_latency,
+            "server_failure_rate": args.server_failure_rate,
+            "server_cache_ttl": args.server_cache_ttl,
+        },
+        "license_server": {"requests": transport.requests, "failures": transport.failures},
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), help="comma-separated subset to run")
+    parser.add_argument("--server-latency", type=float, default=0.0, help="fake license server latency in ms")
+    parser.add_argument("--server-failure-rate", type=float, default=0.0, help="fraction of 503 replies")
+    parser.add_argument("--server-cache-ttl", type=float,
+                        help="override the verdict cache TTLs (0 sends every validation to the server)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load-results.json")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # license.lic and uploaded tenant licenses are written to the working directory.
+        os.chdir(workdir)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Microbenchmarks for the per-call hot paths of the licensing stack.
+
+Covers CryptoUtils.decrypt_license_data / verify_license_signature,
+LicenseValidator._extract_from_file_content,
+ServerValidator.extract_license_key_from_file and the LicenseMiddleware
+helpers, over generated license fixtures from a few hundred bytes to
+several megabytes. Each benchmark reports ops/sec plus the peak and
+retained memory allocated per call (via tracemalloc).
+
+    python benchmarks/micro.py run [--filter crypto] [--output results.json]
+    python benchmarks/micro.py save              # refresh baselines/micro.json
+    python benchmarks/micro.py compare --threshold 0.2 [--results results.json]
+
+``compare`` exits non-zero when a benchmark is slower, or allocates more,
+than the stored baseline by more than ``--threshold`` (a fraction).
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from support import BACKEND_DIR
+
+BASELINE = Path(__file__).resolve().parent / "baselines" / "micro.json"
+
+SIZES = {"small": 256, "medium": 16 * 1024, "large": 1024 * 1024, "xlarge": 8 * 1024 * 1024}
+
+def _setup_backend():
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+def license_payload(size: int) -> dict:
+    """License data padded with feature flags to roughly ``size`` bytes of JSON."""
+    data = {"plan": "bench", "agents": ["agent1", "agent2", "a1", "a2"], "rate_limit_per_min": 1_000_000,
+            "expires_at": "2099-12-31T23:59:59", "features": []}
+    base = len(json.dumps(data))
+    flag = "feature-%06d"
+    per_flag = len(json.dumps(flag % 0)) + 2
+    data["features"] = [flag % i for i in range(max(0, (size - base) // per_flag))]
+    return data
+
+class Keypair:
+    """Throwaway RSA key installed as the app's public key, so fixtures can be signed."""
+
+    def __init__(self):
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa
+        from utils import crypto_utils
+
+        self._hashes, self._padding = hashes, padding
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        crypto_utils.PUBLIC_KEY_PEM = self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+        crypto_utils.CryptoUtils.load_public_key.cache_clear()
+
+    def sign(self, message: bytes) -> bytes:
+        pss = self._padding.PSS(mgf=self._padding.MGF1(self._hashes.SHA256()),
+                                salt_length=self._padding.PSS.MAX_LENGTH)
+        return self.private_key.sign(message, pss, self._hashes.SHA256())
+
+    def encrypted_data(self, data: dict) -> str:
+        data_bytes = json.dumps(data).encode()
+        combined = {"data": base64.b64encode(data_bytes).decode(),
+                    "signature": base64.b64encode(self.sign(data_bytes)).decode()}
+        return base64.b64encode(json.dumps(combined).encode()).decode()
+
+def write_license_file(directory: str, name: str, size: int) -> str:
+    """A .lic with small headers followed by ``size`` bytes of body."""
+    path = Path(directory) / f"{name}.lic"
+    with open(path, "w") as f:
+        f.write("# Key: bench-license-key\n")
+        f.write(f"# Data: {json.dumps(license_payload(256))}\n")
+        line = "#" + "x" * 78 + "\n"
+        for _ in range(size // len(line)):
+            f.write(line)
+    return str(path)
+
+def build_benchmarks(workdir: str):
+    """Return ``{name: fn}``; each fn runs one call of the code under test."""
+    from middleware.license_middleware import LicenseMiddleware
+    from services.license_snapshot import LicenseSnapshot
+    from utils import crypto_utils
+    from utils.crypto_utils import CryptoUtils
+    from utils.rate_limiter import SlidingWindowRateLimiter
+    from validators.license_file import LicenseFile
+    from validators.license_validator import LicenseValidator
+    from validators.server_validator import ServerValidator
+
+    keys = Keypair()
+    validator = LicenseValidator()
+    server_validator = ServerValidator(server_url="http://license-server.invalid")
+    cache = crypto_utils.verification_cache
+    benchmarks = {}
+
+    for label, size in SIZES.items():
+        data = license_payload(size)
+        encrypted = keys.encrypted_data(data)
+        signature_hex = keys.sign(json.dumps(data, sort_keys=True).encode()).hex()
+        encrypted_file = LicenseFile(None, "bench-license-key", encrypted, None, "", len(encrypted))
+        plain_file = LicenseFile(None, "bench-license-key", None, json.dumps(data), "", size)
+        path = write_license_file(workdir, label, size)
+
+        def cold(fn):
+            # Drop memoized signature verdicts so every call does the RSA work.
+            def run():
+                cache.clear()
+                return fn()
+            return run
+
+        decrypt = lambda encrypted=encrypted: CryptoUtils.decrypt_license_data(encrypted)
+        verify = lambda data=data, sig=signature_hex: CryptoUtils.verify_license_signature(data, sig)
+        benchmarks[f"crypto.decrypt_license_data[{label},warm]"] = decrypt
+        benchmarks[f"crypto.decrypt_license_data[{label},cold]"] = cold(decrypt)
+        benchmarks[f"crypto.verify_license_signature[{label},warm]"] = verify
+        benchmarks[f"crypto.verify_license_signature[{label},cold]"] = cold(verify)
+        benchmarks[f"validator._extract_from_file_content[{label},encrypted]"] = (
+            lambda f=encrypted_file: validator._extract_from_file_content(f))
+        benchmarks[f"validator._extract_from_file_content[{label},plain]"] = (
+            lambda f=plain_file: validator._extract_from_file_content(f))
+        benchmarks[f"server_validator.extract_license_key_from_file[{label}]"] = (
+            lambda path=path: server_validator.extract_license_key_from_file(path))
+
+    middleware = LicenseMiddleware(app=None, license_service=None, rate_limiter=SlidingWindowRateLimiter())
+    snapshot = LicenseSnapshot.compile(license_payload(SIZES["small"]) | {"server_verified": True}, 1, "bench")
+    benchmarks["middleware._is_license_expired"] = lambda: middleware._is_license_expired(snapshot)
+    benchmarks["middleware._check_agent_access"] = lambda: middleware._check_agent_access("agent2", snapshot)
+    benchmarks["middleware._check_rate_limit"] = lambda: middleware._check_rate_limit("agent1", snapshot)
+    return benchmarks
+
+def measure(fn, min_time: float, repeats: int) -> dict:
+    fn()  # warm caches and lazy imports
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4 or iterations >= 1 << 24:
+            break
+        iterations *= 4
+    iterations = max(1, int(iterations * min_time / max(elapsed, 1e-9)))
+
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        rates.append(iterations / (time.perf_counter() - start))
+
+    calls = min(iterations, 200)
+    peaks = [0] * calls  # allocated up front so it does not show up as retained memory
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(calls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks[i] = tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(statistics.median(rates), 1),
+        "ops_per_sec_best": round(max(rates), 1),
+        "iterations": iterations,
+        "peak_bytes_per_call": int(statistics.median(peaks)),
+        "retained_bytes_per_call": round(retained / calls, 1),
+    }
+
+def run(args) -> dict:
+    _setup_backend()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in build_benchmarks(workdir).items():
+            if args.filter and args.filter not in name:
+                continue
+            result = results[name] = measure(fn, args.min_time, args.repeats)
+            print(f"{name:<62} {result['ops_per_sec']:>14,.1f} ops/s  "
+                  f"peak {result['peak_bytes_per_call']:>11,} B/call  "
+                  f"retained {result['retained_bytes_per_call']:>9,.1f} B/call")
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+            "platform": platform.platform(), "results": results}
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<62} (no baseline)")
+            continue
+        speed = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        memory = (result["peak_bytes_per_call"] - base["peak_bytes_per_call"]) / max(base["peak_bytes_per_call"], 1)
+        flags = []
+        if speed < -threshold:
+            flags.append("SLOWER")
+        if memory > threshold and result["peak_bytes_per_call"] - base["peak_bytes_per_call"] > 1024:
+            flags.append("MORE ALLOCATIONS")
+        print(f"{name:<62} ops/s {speed:+7.1%}  peak bytes {memory:+7.1%}  {' '.join(flags)}")
+        if flags:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("run", "save", "compare"))
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--results", help="compare this results file instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed fractional slowdown / allocation growth before flagging")
+    args = parser.parse_args()
+
+    if args.command == "compare" and args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.command == "save":
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"FAIL: {len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"OK: no regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Cold-start benchmark: time from process spawn to the first successful /chat.
+
+Each run starts a fresh interpreter in a temporary directory holding a
+license.lic, imports ``main``, runs the app lifespan (license warm-up) and
+posts /chat until it gets a 200. A fake license server stands in for the
+subscription server. Exits non-zero when the median exceeds ``--budget``.
+
+    python benchmarks/startup.py --runs 5 --budget 2.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from support import BACKEND_DIR, FakeLicenseServer, write_license
+
+CHILD = r"""
+import json, sys, time
+t0 = time.time()
+import main
+t_import = time.time()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t_lifespan = time.time()
+    while client.post("/chat", json={"agent": "agent1", "message": "hello"}).status_code != 200:
+        time.sleep(0.001)
+    t_chat = time.time()
+print(json.dumps({"started": t0, "import": t_import - t0, "lifespan": t_lifespan - t_import,
+                  "first_chat": t_chat - t_lifespan, "ready": t_chat}))
+"""
+
+def run_once(server_url: str) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        write_license(workdir)
+        env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), LICENSE_SERVER_URL=server_url,
+                   LOG_LEVEL="WARNING", RATE_LIMIT_BACKEND="memory")
+        spawned = time.time()
+        proc = subprocess.run([sys.executable, "-c", CHILD], cwd=workdir, env=env,
+                              capture_output=True, text=True, timeout=120)
+        if proc.returncode != 0:
+            raise RuntimeError(f"startup run failed:\n{proc.stderr}")
+        timings = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings["interpreter"] = timings.pop("started") - spawned
+        timings["total"] = timings.pop("ready") - spawned
+        return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0")),
+                        help="fail when the median time-to-first-chat exceeds this many seconds")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with FakeLicenseServer() as server:
+        runs = [run_once(server.url) for _ in range(args.runs)]
+
+    summary = {phase: statistics.median(run[phase] for run in runs)
+               for phase in ("interpreter", "import", "lifespan", "first_chat", "total")}
+    report = {"runs": runs, "median": summary, "budget": args.budget,
+              "passed": summary["total"] <= args.budget}
+    for phase, seconds in summary.items():
+        print(f"{phase:>12}: {seconds * 1000:8.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not report["passed"]:
+        print(f"FAIL: median time-to-first-chat {summary['total']:.3f}s exceeds budget {args.budget:.3f}s")
+        sys.exit(1)
+    print(f"OK: median time-to-first-chat {summary['total']:.3f}s within budget {args.budget:.3f}s")
+
+if __name__ == "__main__":
+    main()
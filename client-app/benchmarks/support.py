@@ -0,0 +1,115 @@
+"""Helpers shared by the benchmark scripts: a fake license server and
+license files it will accept."""
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+LICENSE_KEY = "bench-license-key"
+AGENTS = ["agent1", "agent2", "a1", "a2"]
+
+def license_data(rate_limit_per_min: int = 1_000_000) -> dict:
+    return {"plan": "bench", "agents": AGENTS, "rate_limit_per_min": rate_limit_per_min,
+            "expires_at": "2099-12-31T23:59:59"}
+
+def write_license(directory, key: str = LICENSE_KEY, rate_limit_per_min: int = 1_000_000) -> Path:
+    path = Path(directory) / "license.lic"
+    path.write_text(f"# Key: {key}\n# Data: {json.dumps(license_data(rate_limit_per_min))}\n")
+    return path
+
+def _license_reply(path: str, fail: bool):
+    if fail:
+        return 503, {"detail": "unavailable"}
+    if path.startswith("/api/licenses/"):
+        return 200, {"license_data": {"plan_name": "bench", "agents": AGENTS,
+                                      "expires_at": "2099-12-31T23:59:59"}}
+    return 404, {"detail": "not found"}
+
+class _FaultModel:
+    def __init__(self, latency, failure_rate: float, seed: int):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self):
+        with self._lock:
+            self.requests += 1
+            latency = self.latency
+            if isinstance(latency, tuple):
+                latency = self._random.uniform(*latency)
+            fail = self._random.random() < self.failure_rate
+            self.failures += fail
+            return latency, fail
+
+class FakeLicenseTransport(httpx.AsyncBaseTransport, _FaultModel):
+    """In-process httpx transport playing the license server; no sockets.
+
+    Same ``latency`` / ``failure_rate`` semantics as ``FakeLicenseServer``.
+    """
+
+    def __init__(self, latency=0.0, failure_rate: float = 0.0, seed: int = 0):
+        _FaultModel.__init__(self, latency, failure_rate, seed)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        latency, fail = self.decide()
+        if latency:
+            await asyncio.sleep(latency)
+        status, body = _license_reply(request.url.path, fail)
+        return httpx.Response(status, json=body)
+
+class FakeLicenseServer(_FaultModel):
+    """Subscription-server stand-in answering ``GET /api/licenses/<key>``.
+
+    ``latency`` (seconds, or a ``(low, high)`` range) delays every reply and
+    ``failure_rate`` is the fraction of replies that are 503s.
+    """
+
+    def __init__(self, latency=0.0, failure_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency, failure_rate, seed)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                latency, fail = server.decide()
+                if latency:
+                    time.sleep(latency)
+                status, body = _license_reply(self.path, fail)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler